@@ -18,6 +18,24 @@ namespace src_cs {
     class InstanceParser {
         public static WarehouseInstanceOld Parse(string instancePath) {
             StreamReader file = new StreamReader(instancePath);
+            Graph graph = ParseLayout(file);
+            Agent[] agents = ParseOrders(file, graph);
+            file.Close();
+            return new WarehouseInstanceOld(graph, agents);
+        }
+
+        // Parses an instance split into the layout section and the orders section files.
+        public static WarehouseInstanceOld Parse(string layoutPath, string ordersPath) {
+            StreamReader layoutFile = new StreamReader(layoutPath);
+            Graph graph = ParseLayout(layoutFile);
+            layoutFile.Close();
+            StreamReader ordersFile = new StreamReader(ordersPath);
+            Agent[] agents = ParseOrders(ordersFile, graph);
+            ordersFile.Close();
+            return new WarehouseInstanceOld(graph, agents);
+        }
+
+        static Graph ParseLayout(StreamReader file) {
             Graph graph = new Graph();
             Dictionary<string, int> verticesIndices = new Dictionary<string, int>();
             string line;
@@ -65,6 +83,11 @@ namespace src_cs {
                 Edge newEdge = new Edge(verticesIndices[edgeVertices[0]], verticesIndices[edgeVertices[1]], 1);
                 graph.AddEdge(newEdge);
             }
+            return graph;
+        }
+
+        static Agent[] ParseOrders(StreamReader file, Graph graph) {
+            string[] tokens;
 
             // Parse agents and orders.
             List<Agent> agents = new List<Agent>();
@@ -99,7 +122,7 @@ namespace src_cs {
                 }
                 agents.Add(new Agent(ordersList.ToArray(), i));
             }
-            return new WarehouseInstanceOld(graph, agents.ToArray());
+            return agents.ToArray();
         }
 
         public static WarehouseInstance Parse2(string instancePath) {
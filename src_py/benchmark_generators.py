@@ -0,0 +1,175 @@
+"""Benchmarks of the instance generation stages over the warehouse types.
+
+Every stage is timed over a number of repeats, its peak traced memory is measured by
+tracemalloc in a separate run. The scaling exponents of time and memory in the number of
+vertices of the warehouse are fitted on a log-log scale. Results are saved as JSON, a
+previous result file can be passed by --compare to list the regressions.
+
+Usage:
+    python benchmark_generators.py --wh-types 0 1 2 --repeat 3 --output ../data/benchmark.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+import glns_instance_generator as glns
+import gtsp_instance_generator as gtsp
+import test_warehouse_generator as twg
+import time_expanded_graph as teg
+
+SEED = 0
+# Time steps of the benchmarked GLNS time expanded graph, the real instances are too large to write.
+GLNS_TIME_STEPS = 20
+
+
+def _stages(wh_type, graph, out_dir):
+    """ Returns the benchmarked stages of the warehouse type as (name, callable) pairs. """
+    max_items = int(graph.items[..., 0].max()) + 1
+
+    def glns_graph():
+        nx_graph = graph.to_networkx()
+        glns.add_special_vertices(nx_graph, [1, 2, 3])
+        return teg.build_time_expanded_graph(nx_graph, GLNS_TIME_STEPS)
+
+    return [
+        ("build_warehouse", lambda: twg.build_warehouse(wh_type, twg.layout_generator(wh_type, SEED))),
+        ("generate_warehouse_graph", lambda: twg.generate_warehouse_graph(wh_type, twg.layout_generator(wh_type, SEED))),
+        ("find_items", lambda: twg.find_items(graph, max_items)),
+        ("generate_order", lambda: twg.generate_order(graph, rng=np.random.default_rng(SEED))),
+        ("generate_gtsp_random_instance",
+         lambda: gtsp.generate_gtsp_random_instance(wh_type, 20, 5, Path(out_dir).joinpath("gtsp.txt"), seed=SEED)),
+        ("glns_time_expanded_graph", glns_graph),
+    ]
+
+
+def measure(function, repeat):
+    """ Times the function and measures its peak traced memory.
+
+    :param function: Callable without arguments.
+    :param repeat: Number of timed runs.
+    :return: Tuple: (list of seconds of each run, peak bytes).
+    """
+    seconds = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            seconds.append(time.perf_counter() - start)
+
+        tracemalloc.start()
+        try:
+            function()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return seconds, peak
+
+
+def scaling_exponent(sizes, values):
+    """ Fits values ~ sizes^k on a log-log scale.
+
+    :return: The exponent k, None for less than two sizes.
+    """
+    if len(set(sizes)) < 2:
+        return None
+    return float(np.polyfit(np.log(sizes), np.log(np.maximum(values, 1e-9)), 1)[0])
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(wh_types, repeat=3, stages=None):
+    """ Benchmarks the stages on each warehouse type.
+
+    :param wh_types: Warehouse types.
+    :param repeat: Number of timed runs of each stage.
+    :param stages: Names of the benchmarked stages, all if None.
+    :return: Dict of the results, see the module docstring.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as out_dir:
+        for wh_type in wh_types:
+            graph = twg.build_warehouse(wh_type, twg.layout_generator(wh_type, SEED))
+            for name, function in _stages(wh_type, graph, out_dir):
+                if stages is not None and name not in stages:
+                    continue
+                seconds, peak = measure(function, repeat)
+                results.append({"stage": name, "wh_type": wh_type, "vertices": len(graph), "seconds": seconds,
+                                "best": min(seconds), "median": float(np.median(seconds)), "peak_bytes": peak})
+                print(f"{name} type {wh_type}: {min(seconds):.4f} s, {peak / 2**20:.1f} MiB")
+
+    scaling = {}
+    for name in dict.fromkeys(result["stage"] for result in results):
+        stage_results = [result for result in results if result["stage"] == name]
+        sizes = [result["vertices"] for result in stage_results]
+        scaling[name] = {
+            "time_exponent": scaling_exponent(sizes, [result["best"] for result in stage_results]),
+            "memory_exponent": scaling_exponent(sizes, [result["peak_bytes"] for result in stage_results]),
+        }
+    return {"commit": _commit(), "python": platform.python_version(), "numpy": np.__version__,
+            "repeat": repeat, "results": results, "scaling": scaling}
+
+
+def compare(current, previous, threshold=1.2):
+    """ Lists the stages slower or more memory hungry than in the previous results.
+
+    :param current: Results of run_benchmarks.
+    :param previous: Earlier results of run_benchmarks.
+    :param threshold: Minimal ratio of a regression.
+    :return: List of (stage, wh_type, metric, ratio) tuples.
+    """
+    previous_results = {(result["stage"], result["wh_type"]): result for result in previous["results"]}
+    regressions = []
+    for result in current["results"]:
+        old = previous_results.get((result["stage"], result["wh_type"]))
+        if old is None:
+            continue
+        for metric in ("best", "peak_bytes"):
+            ratio = result[metric] / max(old[metric], 1e-9)
+            if ratio > threshold:
+                regressions.append((result["stage"], result["wh_type"], metric, ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the instance generation stages.")
+    parser.add_argument("--wh-types", type=int, nargs="+", default=[0, 1])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--stages", nargs="+", default=None)
+    parser.add_argument("--output", default="../data/benchmark.json")
+    parser.add_argument("--compare", default=None, help="previous results to compare with")
+    parser.add_argument("--threshold", type=float, default=1.2, help="minimal ratio reported as a regression")
+    args = parser.parse_args(argv)
+
+    previous = None
+    if args.compare is not None:
+        with open(args.compare) as file:
+            previous = json.load(file)
+
+    results = run_benchmarks(args.wh_types, args.repeat, args.stages)
+    for name, exponents in results["scaling"].items():
+        print(f"{name}: time ~ n^{exponents['time_exponent']}, memory ~ n^{exponents['memory_exponent']}")
+    Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, "w") as file:
+        json.dump(results, file, indent=2)
+
+    if previous is not None:
+        for stage, wh_type, metric, ratio in compare(results, previous, args.threshold):
+            print(f"Regression: {stage} type {wh_type} {metric} x{ratio:.2f}")
+
+
+if __name__ == "__main__":
+    main()
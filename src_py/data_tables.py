@@ -0,0 +1,372 @@
+"""Columnar (struct-of-arrays) tables of the parsed warehouse data.
+
+Every column is a NumPy array, string columns are dictionary-encoded into int32 codes and
+dates are stored as datetime64[D]. The dataclasses of data_model serve as per-row views.
+"""
+import datetime
+
+import numpy as np
+
+from data_model import Coordinates, Inventory, Item, ItemUnit, Location, PickerOrder
+
+DATE_FORMAT = "%d.%m.%Y"
+# Day zero of the Excel serial date numbers.
+EXCEL_EPOCH = np.datetime64("1899-12-30", "D")
+
+
+class Categorical:
+    """String column encoded as int32 codes into sorted categories."""
+
+    def __init__(self, codes, categories):
+        self.codes = codes
+        self.categories = categories
+
+    @classmethod
+    def encode(cls, values):
+        values = np.array(["" if value is None else str(value) for value in values], dtype=str)
+        categories, codes = np.unique(values, return_inverse=True)
+        return cls(codes.astype(np.int32), categories)
+
+    @classmethod
+    def concat(cls, parts):
+        """ Concatenates categorical columns with different categories. """
+        categories = np.unique(np.concatenate([part.categories for part in parts])) if parts else np.array([], str)
+        codes = [np.searchsorted(categories, part.categories)[part.codes].astype(np.int32) for part in parts]
+        return cls(np.concatenate(codes) if codes else np.array([], np.int32), categories)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, index):
+        return Categorical(self.codes[index], self.categories)
+
+    def code(self, value):
+        """ Returns the code of the value, -1 if the value does not occur. """
+        idx = np.searchsorted(self.categories, value)
+        return int(idx) if idx < len(self.categories) and self.categories[idx] == value else -1
+
+    def isin(self, values):
+        codes = [self.code(value) for value in values]
+        return np.isin(self.codes, [code for code in codes if code >= 0])
+
+    def values(self):
+        return self.categories[self.codes]
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + self.categories.nbytes
+
+
+def lookup(categories, values):
+    """ Finds values in sorted categories.
+
+    :param categories: Sorted array.
+    :param values: Array of values.
+    :return: int64 array of the indices of the values, -1 for the values not found.
+    """
+    # Casting to the dtype of the categories would truncate longer strings into false matches.
+    values = np.asarray(values, dtype=str) if categories.dtype.kind == "U" else np.asarray(values)
+    idx = np.searchsorted(categories, values)
+    found = idx < len(categories)
+    found[found] = categories[idx[found]] == values[found]
+    return np.where(found, idx, -1)
+
+
+def to_dates(values):
+    """ Converts date cells into datetime64[D].
+
+    Accepts "dd.mm.yyyy" strings, datetime objects and Excel serial numbers, missing values
+    and any other text become NaT. Every distinct value is converted only once.
+
+    :param values: Sequence of cell values.
+    :return: datetime64[D] array.
+    """
+    encoded = Categorical.encode(values)
+    converted = np.empty(len(encoded.categories), dtype="datetime64[D]")
+    for i, value in enumerate(encoded.categories):
+        try:
+            converted[i] = EXCEL_EPOCH + np.timedelta64(int(float(value)), "D")
+        except ValueError:
+            try:
+                converted[i] = np.datetime64(datetime.datetime.strptime(value, DATE_FORMAT).date(), "D")
+            except ValueError:
+                try:
+                    converted[i] = np.datetime64(value[:10], "D") if value else np.datetime64("NaT")
+                except ValueError:
+                    # Any other text, e.g. "N/A".
+                    converted[i] = np.datetime64("NaT")
+    return converted[encoded.codes]
+
+
+def to_numbers(values, dtype=np.float64):
+    """ Converts numeric cells, missing values become NaN (or 0 for integer dtypes). """
+    numbers = np.array([np.nan if value is None or value == "" else float(value) for value in values],
+                       dtype=np.float64)
+    if np.issubdtype(dtype, np.integer):
+        numbers = np.nan_to_num(numbers)
+    return numbers.astype(dtype)
+
+
+def _format_date(date):
+    return "" if np.isnat(date) else date.astype(datetime.date).strftime(DATE_FORMAT)
+
+
+class Table:
+    """Base of the columnar tables.
+
+    Subclasses define record_type, the data_model dataclass of a row, and schema, the
+    (column, kind) pairs in the argument order of record_type. Kinds are "str", "date",
+    "int" and "float".
+    """
+
+    record_type = None
+    schema = ()
+
+    def __init__(self, columns):
+        self.columns = columns
+
+    def __getattr__(self, name):
+        try:
+            return self.__dict__["columns"][name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __len__(self):
+        return len(next(iter(self.columns.values())))
+
+    @classmethod
+    def from_rows(cls, rows):
+        """ Builds the table from tuples of cell values in the schema order.
+
+        :param rows: List of tuples.
+        :return: Table.
+        """
+        values = list(zip(*rows)) if rows else [()] * len(cls.schema)
+        columns = {}
+        for (name, kind), column in zip(cls.schema, values):
+            if kind == "str":
+                columns[name] = Categorical.encode(column)
+            elif kind == "date":
+                columns[name] = to_dates(column)
+            elif kind == "int":
+                columns[name] = to_numbers(column, np.int64)
+            else:
+                columns[name] = to_numbers(column)
+        return cls(columns)
+
+    @classmethod
+    def from_records(cls, records):
+        """ Builds the table from data_model dataclass instances. """
+        return cls.from_rows([tuple(getattr(record, name) for name, _ in cls.schema) for record in records])
+
+    @classmethod
+    def from_batches(cls, batches):
+        """ Builds the table from batches of records, only one batch is kept as Python objects. """
+        return cls.concat([cls.from_records(batch) for batch in batches])
+
+    @classmethod
+    def concat(cls, tables):
+        if not tables:
+            return cls.from_records([])
+        columns = {}
+        for name, column in tables[0].columns.items():
+            parts = [table.columns[name] for table in tables]
+            columns[name] = Categorical.concat(parts) if isinstance(column, Categorical) else np.concatenate(parts)
+        return cls(columns)
+
+    def to_arrays(self, prefix):
+        """ Flattens the columns into named arrays, e.g. for np.savez.
+
+        :param prefix: Prefix of the array names.
+        :return: Dict of name -> array.
+        """
+        arrays = {}
+        for name, column in self.columns.items():
+            if isinstance(column, Categorical):
+                arrays[prefix + "." + name + ".codes"] = column.codes
+                arrays[prefix + "." + name + ".categories"] = column.categories
+            else:
+                arrays[prefix + "." + name] = column
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays, prefix):
+        """ Restores the table from the arrays of to_arrays.
+
+        :param arrays: Mapping of name -> array, e.g. the result of np.load.
+        :param prefix: Prefix of the array names.
+        :return: Table.
+        """
+        columns = {}
+        for key in arrays.keys():
+            if not key.startswith(prefix + "."):
+                continue
+            name, *part = key[len(prefix) + 1:].split(".")
+            if not part:
+                columns[name] = arrays[key]
+            elif part[0] == "codes":
+                columns[name] = Categorical(arrays[key], arrays[prefix + "." + name + ".categories"])
+        return cls(columns)
+
+    def take(self, index):
+        """ Selects rows by a boolean mask or an index array.
+
+        :return: Table of the same type.
+        """
+        return type(self)({name: column[index] for name, column in self.columns.items()})
+
+    def row(self, i):
+        """ Returns the i-th row as a record_type view. """
+        values = []
+        for name, kind in self.schema:
+            column = self.columns[name]
+            if kind == "str":
+                values.append(str(column.categories[column.codes[i]]))
+            elif kind == "date":
+                values.append(_format_date(column[i]))
+            else:
+                values.append(column[i].item())
+        return self.record_type(*values)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.row(i)
+
+    def count_by(self, name):
+        """ Number of rows of each category of a string column. """
+        column = self.columns[name]
+        return dict(zip(column.categories.tolist(), np.bincount(column.codes, minlength=len(column.categories))))
+
+    def sum_by(self, value_name, by_name):
+        """ Sum of a numeric column over the categories of a string column. """
+        column = self.columns[by_name]
+        sums = np.bincount(column.codes, weights=self.columns[value_name], minlength=len(column.categories))
+        return dict(zip(column.categories.tolist(), sums))
+
+    def between(self, date_name, start, end=None):
+        """ Selects the rows with date_name in [start, end], a single day if end is None. """
+        start = np.datetime64(start, "D")
+        end = start if end is None else np.datetime64(end, "D")
+        dates = self.columns[date_name]
+        return self.take((dates >= start) & (dates <= end))
+
+    @property
+    def nbytes(self):
+        return sum(column.nbytes for column in self.columns.values())
+
+
+class ItemsTable(Table):
+    """Items with their unit levels, the unit columns have shape (items, levels)."""
+
+    record_type = Item
+    schema = (("id", "str"), ("description", "str"), ("gtype", "str"), ("zone", "str"))
+    unit_schema = ("conversion_qty", "length", "width", "height", "weight")
+
+    @classmethod
+    def from_records(cls, records):
+        records = list(records)
+        table = cls.from_rows([tuple(getattr(record, name) for name, _ in cls.schema) for record in records])
+        levels = max((len(record.unit_levels) for record in records), default=0)
+        units = [record.unit_levels + [None] * (levels - len(record.unit_levels)) for record in records]
+        for name in cls.unit_schema:
+            table.columns[name] = to_numbers([getattr(unit, name, None) for row in units for unit in row])\
+                .reshape(len(records), levels)
+        uom = Categorical.encode([getattr(unit, "qty_uom", None) for row in units for unit in row])
+        table.columns["qty_uom"] = Categorical(uom.codes.reshape(len(records), levels), uom.categories)
+        return table
+
+    def row(self, i):
+        units = []
+        for level in range(self.qty_uom.codes.shape[1]):
+            values = [self.columns[name][i, level].item() for name in self.unit_schema]
+            if all(np.isnan(values)):
+                continue
+            conversion_qty, length, width, height, weight = values
+            qty_uom = str(self.qty_uom.categories[self.qty_uom.codes[i, level]])
+            units.append(ItemUnit(conversion_qty, qty_uom, length, width, height, None, weight, None))
+        item_id, description, gtype, zone = (str(self.columns[name].categories[self.columns[name].codes[i]])
+                                             for name, _ in self.schema)
+        return Item(item_id, description, gtype, zone, units[0] if units else None, units)
+
+
+class OrdersTable(Table):
+    """Order lines with the PICKER column, rows are PickerOrder views."""
+
+    record_type = PickerOrder
+    schema = (("id", "int"), ("direction", "str"), ("country", "str"), ("delivery_date", "date"),
+              ("s_ship_date", "date"), ("a_ship_date", "date"), ("line_num", "int"), ("item_id", "str"),
+              ("requested_qty", "float"), ("total_qty", "float"), ("qty_uom", "str"), ("picker", "str"))
+
+    def by_date(self, start, end=None, date_name="s_ship_date"):
+        return self.between(date_name, start, end)
+
+    def by_picker(self, *pickers):
+        return self.take(self.picker.isin(pickers))
+
+
+class InventoryTable(Table):
+    """Inventory balance snapshots, rows are Inventory views."""
+
+    record_type = Inventory
+    schema = (("date", "date"), ("location_id", "str"), ("ltype", "str"), ("item_id", "str"),
+              ("expiry_date", "str"), ("available_qty", "float"), ("onhand_qty", "float"),
+              ("transi_qty", "float"), ("allocated_qty", "float"), ("suspense_qty", "float"))
+
+    def by_date(self, start, end=None):
+        return self.between("date", start, end)
+
+
+class LocationsTable(Table):
+    """Storage locations joined with their coordinates, -1 for missing coordinates."""
+
+    record_type = Location
+    schema = (("id", "str"), ("ltype", "str"), ("lclass", "str"), ("lsubclass", "str"), ("length", "float"),
+              ("width", "float"), ("height", "float"), ("dim_uom", "str"), ("max_weight", "float"),
+              ("weight_uom", "str"), ("zone", "str"))
+
+    @classmethod
+    def from_records(cls, records):
+        records = list(records)
+        table = cls.from_rows([tuple(getattr(record, name, None) for name, _ in cls.schema) for record in records])
+        for axis in ("x", "y", "z"):
+            table.columns[axis] = np.array([-1 if record.coord is None else getattr(record.coord, axis)
+                                            for record in records], dtype=np.int32)
+        return table
+
+    def by_zone(self, *zones):
+        return self.take(self.zone.isin(zones))
+
+    def join_coordinates(self, location_ids, coordinates):
+        """ Sets the coordinates of the locations in place.
+
+        :param location_ids: Sequence of location ids.
+        :param coordinates: int32 array of shape (len(location_ids), 3).
+        :return: The table.
+        """
+        location_ids = np.array([str(location_id) for location_id in location_ids], dtype=str)
+        rows = self.rows_of(location_ids)
+        if (rows < 0).any():
+            raise KeyError(str(location_ids[np.argmin(rows)]))
+        for axis, name in enumerate(("x", "y", "z")):
+            self.columns[name][rows] = coordinates[:, axis]
+        return self
+
+    def rows_of(self, location_ids):
+        """ Returns the rows of the location ids, -1 for unknown ids. """
+        codes = lookup(self.id.categories, location_ids)
+        rows = np.empty(len(self.id.categories), dtype=np.int64)
+        rows[self.id.codes] = np.arange(len(self))
+        return np.where(codes >= 0, rows[codes.clip(min=0)] if len(rows) else -1, -1)
+
+    def coordinates(self, rows):
+        """ Returns the x, y, z of the rows as an int32 (rows, 3) array, -1 for rows < 0. """
+        coordinates = np.full((len(rows), 3), -1, dtype=np.int32)
+        for axis, name in enumerate(("x", "y", "z")):
+            coordinates[rows >= 0, axis] = self.columns[name][rows[rows >= 0]]
+        return coordinates
+
+    def row(self, i):
+        location = super().row(i)
+        if self.x[i] >= 0:
+            location.coord = Coordinates(int(self.x[i]), int(self.y[i]), int(self.z[i]))
+        return location
@@ -0,0 +1,159 @@
+"""Shortest path distances over the warehouse graph.
+
+Distances are hop counts (every edge has length 1), the same values as returned by
+nx.algorithms.shortest_path_length without a weight. Vertices are addressed by their index
+in graph.nodes, which is the numbering used in the generated instance files.
+"""
+import numpy as np
+
+from warehouse_graph import WarehouseGraph
+
+# Maximal number of (source, vertex) cells kept in memory by a single BFS batch.
+BATCH_CELLS = 1 << 24
+
+
+def neighbor_table(graph):
+    """ Converts a networkx graph into a padded neighbor table.
+
+    Row i holds the indices of the neighbors of vertex i, missing neighbors are padded with
+    the index len(graph), which serves as a sentinel vertex.
+
+    :param graph: Networkx graph or WarehouseGraph.
+    :return: int32 array of shape (vertices, max_degree).
+    """
+    return neighbor_table_from_csr(*csr_adjacency(graph))
+
+
+def neighbor_table_from_csr(indptr, indices):
+    """ Converts CSR adjacency arrays into a padded neighbor table, see neighbor_table.
+
+    :param indptr: CSR row offsets.
+    :param indices: CSR neighbor indices.
+    :return: int32 array of shape (vertices, max_degree).
+    """
+    vertex_count = len(indptr) - 1
+    degrees = np.diff(indptr)
+    neighbors = np.full((vertex_count, max(int(degrees.max(initial=0)), 1)), vertex_count, dtype=np.int32)
+    rows = np.repeat(np.arange(vertex_count), degrees)
+    neighbors[rows, np.arange(len(rows)) - np.repeat(indptr[:-1], degrees)] = indices
+    return neighbors
+
+
+def _bfs_batch(neighbors, sources, rows=None):
+    """ Runs BFS from all the sources at once.
+
+    The frontier is kept as a flat array of (source, vertex) cells, so each BFS level is
+    a handful of array operations regardless of the number of sources.
+
+    :param neighbors: Padded neighbor table.
+    :param sources: Indices of the source vertices.
+    :param rows: Row of each source, sources of the same row form a single multi-source BFS.
+                 Each source has its own row if None.
+    :return: int32 array of shape (rows, vertices + 1), -1 for unreachable vertices.
+    """
+    vertex_count, max_degree = neighbors.shape
+    row_size = vertex_count + 1
+    rows = np.arange(len(sources), dtype=np.int64) if rows is None else np.asarray(rows, dtype=np.int64)
+    dist = np.full((int(rows.max(initial=-1)) + 1, row_size), -1, dtype=np.int32)
+    dist[rows, sources] = 0
+    # The sentinel vertex counts as visited, so it is never expanded.
+    dist[:, vertex_count] = 0
+    flat = dist.reshape(-1)
+    # Scratch array used to drop duplicate cells without sorting them.
+    owner = np.empty(flat.size, dtype=np.int64)
+
+    frontier_rows = rows
+    frontier = np.asarray(sources, dtype=np.int64)
+    level = 0
+    while frontier.size:
+        level += 1
+        cells = np.repeat(frontier_rows * row_size, max_degree) + neighbors[frontier].ravel()
+        cells = cells[flat[cells] < 0]
+        positions = np.arange(cells.size)
+        owner[cells] = positions
+        cells = cells[owner[cells] == positions]
+        flat[cells] = level
+        frontier_rows, frontier = np.divmod(cells, row_size)
+    return dist
+
+
+def distance_matrix(graph, sources=None, targets=None, neighbors=None):
+    """ Computes the matrix of shortest path distances between the given vertices.
+
+    One BFS is run per source vertex, so the cost grows with the number of sources and not
+    with the number of vertex pairs.
+
+    :param graph: Networkx graph or WarehouseGraph.
+    :param sources: Indices of the row vertices, all vertices if None.
+    :param targets: Indices of the column vertices, all vertices if None.
+    :param neighbors: Precomputed neighbor table of the graph, computed if None.
+    :return: int32 matrix of shape (len(sources), len(targets)), -1 for unreachable pairs.
+    """
+    if neighbors is None:
+        neighbors = neighbor_table(graph)
+    vertex_count = neighbors.shape[0]
+    sources = np.arange(vertex_count) if sources is None else np.asarray(sources, dtype=np.int64)
+    targets = np.arange(vertex_count) if targets is None else np.asarray(targets, dtype=np.int64)
+
+    matrix = np.empty((len(sources), len(targets)), dtype=np.int32)
+    batch = max(1, BATCH_CELLS // (vertex_count + 1))
+    for start in range(0, len(sources), batch):
+        dist = _bfs_batch(neighbors, sources[start:start + batch])
+        matrix[start:start + batch] = dist[:, targets]
+    return matrix
+
+
+def group_distances(graph, groups, targets=None, neighbors=None):
+    """ Computes the distances from groups of vertices, i.e. to the nearest vertex of each group.
+
+    :param graph: Networkx graph or WarehouseGraph.
+    :param groups: List of arrays of vertex indices, none of them empty.
+    :param targets: Indices of the column vertices, all vertices if None.
+    :param neighbors: Precomputed neighbor table of the graph, computed if None.
+    :return: int32 matrix of shape (len(groups), len(targets)), -1 for unreachable pairs.
+    """
+    if neighbors is None:
+        neighbors = neighbor_table(graph)
+    vertex_count = neighbors.shape[0]
+    targets = np.arange(vertex_count) if targets is None else np.asarray(targets, dtype=np.int64)
+
+    matrix = np.empty((len(groups), len(targets)), dtype=np.int32)
+    batch = max(1, BATCH_CELLS // (vertex_count + 1))
+    for start in range(0, len(groups), batch):
+        batch_groups = groups[start:start + batch]
+        sources = np.concatenate(batch_groups).astype(np.int64)
+        rows = np.repeat(np.arange(len(batch_groups)), [len(group) for group in batch_groups])
+        matrix[start:start + batch] = _bfs_batch(neighbors, sources, rows)[:, targets]
+    return matrix
+
+
+def pick_distance_matrix(graph, pick_vertices, depot=0, neighbors=None):
+    """ Computes the distance matrix restricted to the depot and the picking vertices.
+
+    :param graph: Networkx graph or WarehouseGraph.
+    :param pick_vertices: Indices of the picking vertices.
+    :param depot: Index of the depot vertex, stored as the first row and column.
+    :param neighbors: Precomputed neighbor table of the graph, computed if None.
+    :return: int32 matrix of shape (len(pick_vertices) + 1, len(pick_vertices) + 1).
+    """
+    vertices = np.concatenate(([depot], np.asarray(pick_vertices, dtype=np.int64)))
+    return distance_matrix(graph, vertices, vertices, neighbors)
+
+
+def csr_adjacency(graph):
+    """ Converts a networkx graph into CSR adjacency arrays.
+
+    Neighbors of vertex i are indices[indptr[i]:indptr[i+1]], in the order of graph.adj.
+
+    :param graph: Networkx graph or WarehouseGraph.
+    :return: Tuple: (indptr, indices) int32 arrays.
+    """
+    if isinstance(graph, WarehouseGraph):
+        return graph.indptr, graph.indices
+    vertex_dict = {vertex: idx for idx, vertex in enumerate(graph.nodes)}
+    indptr = np.zeros(len(vertex_dict) + 1, dtype=np.int32)
+    indices = []
+    for idx, vertex in enumerate(graph.nodes):
+        indices.extend(vertex_dict[neighbor] for neighbor in graph.adj[vertex])
+        indptr[idx + 1] = len(indices)
+    return indptr, np.array(indices, dtype=np.int32)
@@ -1,65 +1,257 @@
 """Parser of Excel data files."""
 import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+import numpy as np
+
+import instrumentation
 from data_model import *
+from data_tables import InventoryTable, ItemsTable, LocationsTable, OrdersTable
+from workbook_snapshot import load_snapshot, save_snapshot
 from xlrd import open_workbook
 
+# Number of rows yielded at once by the streaming parser.
+BATCH_SIZE = 10000
+# Sheets parsed independently by parse_sheets, the large ones first.
+SHEETS = ("Order", "Inventory Ballance", "ITEMmaster", "LOCATIONmaster", "XYZ_coordinates")
+
+
+def iter_sheet_rows(data_path, sheet_name, batch_size=BATCH_SIZE):
+    """ Yields the rows of a sheet, without the header row, in batches.
+
+    .xlsx workbooks are read by the read-only row iterator of openpyxl, so the sheet is never
+    loaded as a whole. Other workbooks are read row by row through xlrd.
+
+    :param data_path: Path to the workbook.
+    :param sheet_name: Name of the sheet.
+    :param batch_size: Number of rows in a batch.
+    :return: Generator of lists of row tuples of cell values.
+    """
+    if Path(data_path).suffix in (".xlsx", ".xlsm"):
+        from openpyxl import load_workbook
+        document = load_workbook(data_path, read_only=True, data_only=True)
+        rows = document[sheet_name].iter_rows(min_row=2, values_only=True)
+        close = document.close
+    else:
+        document = open_workbook(data_path, on_demand=True)
+        sheet = document.sheet_by_name(sheet_name)
+        rows = (tuple(sheet.row_values(row)) for row in range(1, sheet.nrows))
+        close = document.release_resources
+
+    try:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    finally:
+        close()
 
-def parse_document(data_path):
-    document = open_workbook(data_path)
 
-    # Parse LOCATIONmaster sheet
-    sheet = document.sheet_by_name("LOCATIONmaster")
+def parse_locations(data_path):
+    """ Parses LOCATIONmaster and joins the XYZ_coordinates into the locations.
+
+    :param data_path: Path to the workbook.
+    :return: Dict of location id -> Location.
+    """
     locations = {}
-    for row in range(1, sheet.nrows):
-        location_id = sheet.cell(row, 0).value
-        locations[location_id] = Location(
-            *(sheet.cell(row, i).value for i in range(11))
-        )
-
-    # Parse XYZ_coordinates sheet
-    sheet = document.sheet_by_name("XYZ_coordinates")
-    for row in range(1, sheet.nrows):
-        location_id = sheet.cell(row, 0).value
-        coord = Coord(*(sheet.cell(row, i) for i in range(1, 4)))
-        locations[location_id].set_coord(coord)
-
-    # Parse ITEMmaster sheet
-    sheet = document.sheet_by_name("ITEMmaster")
+    for batch in iter_sheet_rows(data_path, "LOCATIONmaster"):
+        for row in batch:
+            locations[row[0]] = Location(*row[:11])
+
+    for batch in iter_sheet_rows(data_path, "XYZ_coordinates"):
+        for location_id, x, y, z in (row[:4] for row in batch):
+            locations[location_id].coord = Coordinates(int(x), int(y), int(z))
+    return locations
+
+
+def parse_items(data_path):
+    """ Parses ITEMmaster, every 8 columns after the first 4 describe one unit level.
+
+    :param data_path: Path to the workbook.
+    :return: Dict of item id -> Item.
+    """
     items = {}
-    for row in range(1, sheet.nrows):
-        item_id, description, gtype, zone = (sheet.cell(row, i).value for i in range(4))
-        unit_levels = []
-        for col in range(4, sheet.ncols, 8):
-            unit_levels.append(
-                ItemUnit(*(sheet.cell(row, col + i).value for i in range(8)))
+    for batch in iter_sheet_rows(data_path, "ITEMmaster"):
+        for row in batch:
+            item_id, description, gtype, zone = row[:4]
+            unit_levels = [ItemUnit(*row[col:col + 8]) for col in range(4, len(row), 8)]
+            items[item_id] = Item(
+                item_id, description, gtype, zone, unit_levels[0], unit_levels
             )
-        items[item_id] = Item(
-            item_id, description, gtype, zone, unit_levels[0], unit_levels
-        )
+    return items
+
+
+def iter_balance(data_path, batch_size=BATCH_SIZE):
+    """ Yields the Inventory Ballance sheet in batches of Inventory records. """
+    for batch in iter_sheet_rows(data_path, "Inventory Ballance", batch_size):
+        yield [Inventory(*row[:10]) for row in batch]
+
+
+def iter_orders(data_path, batch_size=BATCH_SIZE):
+    """ Yields the Order sheet - 12 columns with the PICKER column - in batches of PickerOrder records. """
+    for batch in iter_sheet_rows(data_path, "Order", batch_size):
+        yield [PickerOrder(*row[:12]) for row in batch]
+
+
+def stream_document(data_path, batch_size=BATCH_SIZE):
+    """ Parses the small sheets and returns generators of batches for the large ones.
+
+    The result can be passed to serialize_warehouse, which then keeps only a single batch of
+    inventory records or orders in memory.
+
+    :param data_path: Path to the workbook.
+    :param batch_size: Number of rows in a batch.
+    :return: Tuple: (locations, items, balance batches, order batches).
+    """
+    return parse_locations(data_path), parse_items(data_path), \
+        iter_balance(data_path, batch_size), iter_orders(data_path, batch_size)
+
+
+def parse_document(data_path, use_snapshot=False):
+    """ Parses the workbook into dicts and lists of data_model records.
+
+    By default the records hold the raw cells, like stream_document. With use_snapshot, the
+    records are views of the tables from parse_tables, dates are then formatted as dd.mm.yyyy.
+
+    :param data_path: Path to the workbook.
+    :param use_snapshot: Load the tables from the workbook snapshot, see workbook_snapshot.
+    :return: Tuple: (locations, items, balance, orders).
+    """
+    with instrumentation.stage("parse_document"):
+        return _parse_document(data_path, use_snapshot)
+
+
+def _parse_document(data_path, use_snapshot):
+    if use_snapshot:
+        locations, items, balance, orders = parse_tables(data_path, use_snapshot=True)
+        locations = {location.id: location for location in locations}
+        items = {item.id: item for item in items}
+        balance = [balance]
+        orders = list(orders)
+    else:
+        locations = parse_locations(data_path)
+        items = parse_items(data_path)
+        balance = iter_balance(data_path)
+        orders = [order for batch in iter_orders(data_path) for order in batch]
 
     # Parse Inventory Balance sheet  ('balance' in final version, most likely)
-    sheet = document.sheet_by_name("Inventory Ballance")
-    balance = {}
-    for row in range(1, sheet.nrows):
-        date, location_id = sheet.cell(row, 0).value, sheet.cell(row, 1).value
-        if not date in balance:
-            balance[date] = {}
-        balance[date][location_id] = Inventory(
-            *(sheet.cell(row, i).value for i in range(10))
-        )
+    balance_by_date = {}
+    balance_rows = 0
+    for batch in balance:
+        balance_rows += len(batch)
+        for record in batch:
+            if not record.date in balance_by_date:
+                balance_by_date[record.date] = {}
+            balance_by_date[record.date][record.location_id] = record
+
+    instrumentation.count("rows_parsed", len(locations) + len(items) + balance_rows + len(orders))
+    return locations, items, balance_by_date, orders
+
+
+def _parse_sheet(data_path, sheet_name, batch_size):
+    start = time.perf_counter()
+    if sheet_name == "LOCATIONmaster":
+        result = LocationsTable.from_batches(
+            [Location(*row[:11]) for row in batch] for batch in iter_sheet_rows(data_path, sheet_name, batch_size))
+    elif sheet_name == "XYZ_coordinates":
+        rows = [row[:4] for batch in iter_sheet_rows(data_path, sheet_name, batch_size) for row in batch]
+        result = [row[0] for row in rows], np.array([row[1:] for row in rows], dtype=np.float64)\
+            .reshape(-1, 3).astype(np.int32)
+    elif sheet_name == "ITEMmaster":
+        result = ItemsTable.from_records(parse_items(data_path).values())
+    elif sheet_name == "Inventory Ballance":
+        result = InventoryTable.from_batches(iter_balance(data_path, batch_size))
+    else:
+        result = OrdersTable.from_batches(iter_orders(data_path, batch_size))
+    return result, time.perf_counter() - start
+
+
+def parse_sheets(data_path, batch_size=BATCH_SIZE, workers=None):
+    """ Parses the sheets of the workbook in parallel into columnar tables.
+
+    Every sheet is parsed by its own worker process, the coordinates are joined into the
+    locations once both sheets are parsed.
+
+    :param data_path: Path to the workbook.
+    :param batch_size: Number of rows in a batch.
+    :param workers: Number of worker processes, one per sheet if None, 1 parses in this process.
+    :return: Tuple: ((LocationsTable, ItemsTable, InventoryTable, OrdersTable), dict of sheet -> seconds).
+        The times are also recorded as "parse_sheet.<sheet>" instrumentation stages.
+    """
+    if workers == 1:
+        parsed = [_parse_sheet(data_path, sheet_name, batch_size) for sheet_name in SHEETS]
+    else:
+        with ProcessPoolExecutor(max_workers=workers or min(len(SHEETS), os.cpu_count())) as executor:
+            parsed = list(executor.map(_parse_sheet, [data_path] * len(SHEETS), SHEETS, [batch_size] * len(SHEETS)))
 
-    # Parse Order sheet - 12 columns with the PICKER column
-    sheet = document.sheet_by_name("Order")
-    orders = []
-    for row in range(1, sheet.nrows):
-        orders.append(PickerOrder(*(sheet.cell(row, i).value for i in range(12))))
+    results = {sheet_name: result for sheet_name, (result, _) in zip(SHEETS, parsed)}
+    timings = {sheet_name: seconds for sheet_name, (_, seconds) in zip(SHEETS, parsed)}
+    start = time.perf_counter()
+    locations = results["LOCATIONmaster"].join_coordinates(*results["XYZ_coordinates"])
+    timings["join"] = time.perf_counter() - start
+    for sheet_name, seconds in timings.items():
+        instrumentation.add_time("parse_sheet." + sheet_name, seconds)
+    return (locations, results["ITEMmaster"], results["Inventory Ballance"], results["Order"]), timings
 
-    return locations, items, balance, orders
+
+def parse_tables(data_path, batch_size=BATCH_SIZE, use_snapshot=True, workers=None):
+    """ Parses the workbook into columnar tables, see data_tables.
+
+    The sheets are parsed in parallel by parse_sheets, which records the time of every sheet
+    as an instrumentation stage.
+    Inventory balance and orders are converted batch by batch, so only one batch of the
+    dataclass records exists at a time. With use_snapshot, the tables are loaded from the
+    snapshot next to the workbook if it is up to date, otherwise the snapshot is rebuilt.
+
+    :param data_path: Path to the workbook.
+    :param batch_size: Number of rows in a batch.
+    :param use_snapshot: Load and store the tables in the workbook snapshot, see workbook_snapshot.
+    :param workers: Number of worker processes of parse_sheets.
+    :return: Tuple: (LocationsTable, ItemsTable, InventoryTable, OrdersTable).
+    """
+    if use_snapshot:
+        tables = load_snapshot(data_path)
+        if tables is not None:
+            return tables
+
+    tables, _ = parse_sheets(data_path, batch_size, workers)
+    if use_snapshot:
+        save_snapshot(data_path, tables)
+    return tables
+
+
+def _balance_batches(balance):
+    if isinstance(balance, dict):
+        for records in balance.values():
+            yield list(records.values())
+    else:
+        yield from balance
+
+
+def _order_batches(orders):
+    if isinstance(orders, list):
+        yield orders
+    else:
+        yield from orders
 
 
 def serialize_warehouse(parsed_warehouse, file_path):
+    """ Writes the parsed warehouse into the text format read by the C# InstanceParser.
+
+    Inventory balance and orders can be either the in-memory collections from parse_document,
+    or generators of batches from stream_document. Orders are written as they come, the
+    balance is grouped by date first, so its sheet need not be sorted by date.
+
+    :param parsed_warehouse: Tuple: (locations, items, balance, orders).
+    :param file_path: Path to the output file.
+    """
     locations = parsed_warehouse[0]
     items = parsed_warehouse[1]
     balance = parsed_warehouse[2]
@@ -102,24 +294,27 @@ def serialize_warehouse(parsed_warehouse, file_path):
     file.write("\n")
     file.write("Inventory balance\n")
     file.write("location_id,item_id,available_qty\n")
-    for date in balance.keys():
+    # Records are grouped by date, the last record of a location wins, as in parse_document.
+    lines_by_date = {}
+    for batch in _balance_batches(balance):
+        for inventory_record in batch:
+            lines_by_date.setdefault(inventory_record.date, {})[inventory_record.location_id] = \
+                f"{inventory_record.location_id},{inventory_record.item_id},{int(inventory_record.available_qty)}\n"
+    for date, lines in lines_by_date.items():
         file.write(f"*date:{date}\n")
-        for inventory_record in balance[date].values():
-            file.write(f"{inventory_record.location_id},{inventory_record.item_id}"\
-                       f",{int(inventory_record.available_qty)}\n"
-                       )
+        file.write("".join(lines.values()))
 
     file.write("\n")
     file.write("Orders\n")
     file.write("order_id,order_line,direction,item_id,requested_qty,picker\n")
-    for order in orders:
-        file.write(f"{int(order.id)},{int(order.line_num)},{order.direction},{order.item_id},{int(order.requested_qty)},{order.picker}\n")
+    for batch in _order_batches(orders):
+        file.write("".join(f"{int(order.id)},{int(order.line_num)},{order.direction},{order.item_id}"\
+                           f",{int(order.requested_qty)},{order.picker}\n" for order in batch))
     file.close()
     print()
 
 
 if __name__ == "__main__":
     data_file = Path(__file__).parent.joinpath("warehouse_no_1.xlsx")
-    document = parse_document(data_file)
-    serialize_warehouse(document, "test_warehouse.txt")
+    serialize_warehouse(stream_document(data_file), "test_warehouse.txt")
     print()
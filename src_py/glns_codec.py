@@ -0,0 +1,162 @@
+"""Codec between the vertex ids of the GLNS instances and the timed warehouse vertices.
+
+Vertex idx of the base graph in layer t has the unpruned index time_steps + t*layer_size + idx - 1,
+the indices below time_steps are the layer substitution vertices. Substitution vertex u stands
+for the agent waiting at the depot in layer u - 1, so it decodes as the depot (vertex 0) at
+time u - 1, the depot start vertex 0 decodes as the depot at time -1. GLNS ids are the 1-based
+indices of the possibly pruned graph.
+
+generate_glns_instance stores the codec next to the instance, "<instance>.codec.npz".
+"""
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+
+def codec_path(file_path):
+    file_path = Path(file_path)
+    return file_path.with_name(file_path.name + ".codec.npz")
+
+
+@dataclass
+class GlnsCodec:
+    """Encodes and decodes arrays of GLNS vertex ids of a time-expanded graph."""
+
+    time_steps: int
+    layer_size: int
+    # Names of the base graph vertices, including the special picking vertices.
+    names: np.ndarray
+    # Ordered product of each base vertex, -1 for the regular vertices.
+    products: np.ndarray
+    # Regular vertex of each base vertex, the storage vertex of the special picking vertices.
+    locations: np.ndarray
+    # Unpruned indices of the vertices, None if the graph is not pruned.
+    vertices: np.ndarray = None
+
+    @classmethod
+    def from_graph(cls, graph, expanded_graph, products):
+        """ Creates the codec of a GLNS instance.
+
+        :param graph: Warehouse graph including the special picking vertices, see add_special_vertices.
+        :param expanded_graph: TimeExpandedGraph of the graph, possibly pruned.
+        :param products: Ids of the ordered products.
+        :return: GlnsCodec.
+        """
+        names = [vertex for vertex in graph.nodes]
+        special = np.array([graph.nodes[vertex]["type"] == "Special" for vertex in names])
+        vertex_products = np.full(len(names), -1, dtype=np.int64)
+        locations = np.arange(len(names), dtype=np.int64)
+        for idx in np.flatnonzero(special).tolist():
+            vertex = graph.nodes[names[idx]]
+            vertex_products[idx] = products[vertex["y"]]
+            locations[idx] = vertex["x"]
+        return cls(expanded_graph.time_steps, expanded_graph.layer_size, np.array(names), vertex_products,
+                   locations, expanded_graph.vertices)
+
+    def encode(self, times, vertices):
+        """ Encodes timed base vertices into GLNS ids.
+
+        :param times: Array of times, see the module docstring for the depot.
+        :param vertices: Array of base graph vertex indices.
+        :return: int64 array of GLNS ids, -1 for the pruned or invalid ones.
+        """
+        times, vertices = np.broadcast_arrays(np.asarray(times, dtype=np.int64), np.asarray(vertices, dtype=np.int64))
+        indices = np.where(vertices == 0, times + 1, self.time_steps + times * self.layer_size + vertices - 1)
+        valid = (vertices >= 0) & (vertices <= self.layer_size) & (times >= np.where(vertices == 0, -1, 0)) & \
+            (times < self.time_steps - 1)
+        if self.vertices is not None:
+            idx = np.searchsorted(self.vertices, indices).clip(max=len(self.vertices) - 1)
+            valid &= self.vertices[idx] == indices
+            indices = idx
+        return np.where(valid, indices + 1, -1)
+
+    def decode(self, ids):
+        """ Decodes GLNS ids into timed base vertices.
+
+        :param ids: Array of GLNS ids.
+        :return: Tuple: (int64 array of times, int64 array of base graph vertex indices).
+        """
+        indices = np.asarray(ids, dtype=np.int64) - 1
+        if self.vertices is not None:
+            indices = self.vertices[indices]
+        layer, vertices = np.divmod(indices - self.time_steps, self.layer_size)
+        depot = indices < self.time_steps
+        return np.where(depot, indices - 1, layer), np.where(depot, 0, vertices + 1)
+
+    def save(self, path):
+        arrays = {"time_steps": self.time_steps, "layer_size": self.layer_size, "names": self.names,
+                  "products": self.products, "locations": self.locations}
+        if self.vertices is not None:
+            arrays["vertices"] = self.vertices
+        np.savez_compressed(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as arrays:
+            return cls(int(arrays["time_steps"]), int(arrays["layer_size"]), arrays["names"], arrays["products"],
+                       arrays["locations"], arrays["vertices"] if "vertices" in arrays else None)
+
+
+@dataclass
+class GlnsTour:
+    """Decoded GLNS tour, starting at the depot."""
+
+    cost: int
+    # Time and base vertex of each visited vertex.
+    times: np.ndarray
+    vertices: np.ndarray
+    # Time, product and storage vertex of each pick.
+    pick_times: np.ndarray
+    pick_products: np.ndarray
+    pick_locations: np.ndarray
+
+
+def read_tour(path):
+    """ Reads the tour of a GLNS solver output file.
+
+    :param path: Path to the output file with a "Tour Ordering : [...]" line.
+    :return: Tuple: (tour cost or None, int64 array of GLNS ids).
+    """
+    cost, ids = None, None
+    with open(path) as file:
+        for line in file:
+            key, _, value = line.partition(":")
+            key = key.strip()
+            if key == "Tour Cost":
+                cost = int(float(value))
+            elif key == "Tour Ordering":
+                ids = np.array(value.strip().strip("[]").split(","), dtype=np.int64)
+    if ids is None:
+        raise ValueError("No tour ordering in " + str(path) + ".")
+    return cost, ids
+
+
+def decode_tour(ids, codec, cost=None):
+    """ Decodes a GLNS tour into the timed vertex path and the pick events.
+
+    The tour is rotated to start at the depot start vertex and the substitution vertices
+    of the skipped layers are left out of the path.
+
+    :param ids: Array of GLNS ids of the tour.
+    :param codec: GlnsCodec of the instance.
+    :param cost: Cost of the tour.
+    :return: GlnsTour.
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    start = np.flatnonzero(ids == 1)
+    if len(start):
+        ids = np.roll(ids, -start[0])
+    times, vertices = codec.decode(ids)
+    # Substitution vertices other than the depot start.
+    path = (vertices != 0) | (times < 0)
+    times, vertices = times[path], vertices[path]
+    picks = codec.products[vertices] >= 0
+    return GlnsTour(cost, times, vertices, times[picks], codec.products[vertices[picks]],
+                    codec.locations[vertices[picks]])
+
+
+def decode_tour_file(path, codec):
+    """ Reads and decodes a GLNS solver output file, see decode_tour. """
+    cost, ids = read_tour(path)
+    return decode_tour(ids, codec, cost)
@@ -1,27 +1,109 @@
-import io
 import numpy as np
 
+import glns_codec
+import instance_writer as iw
+import instrumentation
 import test_warehouse_generator as twg
+import time_expanded_graph as teg
 
 
-def generate_glns_instance(wh_type, products):
+def generate_glns_instance(wh_type, products, file_path="output", compress=False, cache=None, seed=None,
+                           prune=True):
     """ Generates an generalized TSP instance for GLNS solver.
 
     :param wh_type:
     :param products:
-    :return:
+    :param file_path: Path to the output file.
+    :param compress: Whether to gzip the output file.
+    :param cache: LayoutCache to load the layout from, requires seed.
+    :param seed: Seed of the layout, random if None.
+    :param prune: Leave out the vertices no tour can use, see teg.prune_time_expanded_graph.
+    :return: WriteStats of the written file. The GlnsCodec of the instance is saved next to it,
+        see glns_codec.codec_path.
     """
-    graph = twg.generate_warehouse_graph(wh_type)
+    if cache is not None:
+        graph = cache.get_layout(wh_type, seed).to_networkx()
+    else:
+        graph = twg.generate_warehouse_graph(wh_type, None if seed is None else twg.layout_generator(wh_type, seed))
     orig_vertices = [vertex for vertex in graph.nodes]
+    special_vertices = add_special_vertices(graph, products)
+
+    enum = [vertex for vertex in graph.nodes]
+    time_steps = int(twg.PRODUCT_CAPACITY[wh_type] // twg.HEIGHT[wh_type] // 2) + 10
+    layer_size = len(enum) - 1
+    with instrumentation.stage("glns_time_expanded_graph"):
+        expanded_graph = teg.build_time_expanded_graph(graph, time_steps)
+    if prune:
+        with instrumentation.stage("glns_prune"):
+            expanded_graph = teg.prune_time_expanded_graph(expanded_graph)
+    final_size = expanded_graph.size
+    instrumentation.count("glns_vertices", final_size)
+    instrumentation.count("glns_edges", len(expanded_graph.rows))
+
+    out = iw.InstanceWriter(file_path, compress)
+    out.write("NAME: 65rbg323" + "\n")
+    out.write("TYPE: AGTSP" + "\n")
+    out.write("COMMENT: Stacker crane application (Ascheuer)" + "\n")
+    out.write("DIMENSION: " + str(final_size) + "\n")
+    out.write("GTSP_SETS: " + str(time_steps-1 + len(products) + 1) + "\n")
+    out.write("EDGE_WEIGHT_TYPE: EXPLICIT" + "\n")
+    out.write("EDGE_WEIGHT_FORMAT: FULL_MATRIX " + "\n")
+    out.write("EDGE_WEIGHT_SECTION" + "\n")
+    with instrumentation.stage("glns_matrix"):
+        out.write_matrix(expanded_graph.iter_row_blocks(), " %d")
+
+    out.write("GTSP_SET_SECTION:" + "\n")
+
+    def write_set(set_idx, vertices):
+        # Vertices are 1-based unpruned indices.
+        vertices = expanded_graph.index_of(np.asarray(vertices) - 1)
+        out.write(str(set_idx) + " " + "".join(str(vertex + 1) + " " for vertex in vertices[vertices >= 0].tolist()))
+        out.write("-1\n")
+
+    # Add depot.
+    write_set(1, [1])
+    set_idx = 2
+
+    # Add set for each graph time step.
+    for i in range(1, time_steps):
+        write_set(set_idx, [i+1] + [time_steps + ((i-1) * layer_size) + j for j in range(1, len(orig_vertices))])
+        set_idx += 1
+
+    index_offset = len(orig_vertices)
+    # Add set for each items picking locations.
+    for i in range(len(special_vertices)):
+        vertices = []
+        for vertex in special_vertices[i]:
+            for time in range(1, time_steps):
+                vertices.append(time_steps + ((time-1) * layer_size) + index_offset)
+            index_offset += 1
+        if len(vertices) and (expanded_graph.index_of(np.asarray(vertices) - 1) < 0).all():
+            raise ValueError("Product " + str(products[i]) + " cannot be picked within " + str(time_steps) +
+                             " time steps.")
+        write_set(set_idx, vertices)
+        set_idx += 1
+
+    out.write("EOF" + "\n")
+    stats = out.close()
+    glns_codec.GlnsCodec.from_graph(graph, expanded_graph, products).save(glns_codec.codec_path(out.file_path))
+    print("GLNS instance written: " + str(stats))
+    return stats
+
+
+def add_special_vertices(graph, products):
+    """ Adds a special picking vertex for each location of each product into the graph.
+
+    :param graph: Warehouse graph, modified in place.
+    :param products: Ids of the ordered products.
+    :return: List of special vertex names for each product.
+    """
     special_vertices = []
     item_positions = twg.find_items(graph, 50000)
-    products_positions = []
     for product_idx, product in enumerate(products):
         positions = item_positions[product]
-        products_positions.append(positions)
         special_vertices.append([])
         # Create special vertices
-        for idx_2, vertex_idx in enumerate(positions):
+        for idx_2, (vertex_idx, _, _) in enumerate(positions):
             node_index = "special_" + str(product_idx) + "_" + str(idx_2)
             graph.add_node(node_index)
             graph.nodes[node_index]["type"] = "Special"
@@ -30,12 +112,33 @@ def generate_glns_instance(wh_type, products):
             graph.nodes[node_index]["left"] = None
             graph.nodes[node_index]["right"] = None
             special_vertices[product_idx].append(node_index)
+    return special_vertices
 
+
+def build_glns_matrix(graph, time_steps):
+    """ Builds the dense edge weight matrix of the time-expanded graph.
+
+    The result is identical to _build_glns_matrix_loop. Needs final_size^2 memory, use
+    teg.build_time_expanded_graph for anything but small instances.
+
+    :param graph: Warehouse graph including the special picking vertices.
+    :param time_steps: Number of time layers.
+    :return: Matrix of shape (final_size, final_size).
+    """
+    return teg.build_time_expanded_graph(graph, time_steps).to_dense()
+
+
+def _build_glns_matrix_loop(graph, time_steps):
+    """ Reference implementation of build_glns_matrix, filling the matrix edge by edge.
+
+    :param graph: Warehouse graph including the special picking vertices.
+    :param time_steps: Number of time layers.
+    :return: Matrix of shape (final_size, final_size).
+    """
     enum = [vertex for vertex in graph.nodes]
     vertex_dict = {}
     for idx, vertex in enumerate(enum):
         vertex_dict[vertex] = idx
-    time_steps = int(twg.PRODUCT_CAPACITY[wh_type] // twg.HEIGHT[wh_type] // 2) + 10
     layer_size = len(enum) - 1
     final_size = (time_steps-1) * layer_size + time_steps
     gtsp_distances = np.full((final_size, final_size), time_steps * 1000)
@@ -52,11 +155,6 @@ def generate_glns_instance(wh_type, products):
 
     gtsp_distances[0, time_steps] = 1
 
-    '''
-    for time in range(1, time_steps):
-        for time_2 in range(1, time_steps):
-            gtsp_distances[time, time_2] = 50000
-    '''
     # Fill in edges from layer time into time+1
     for time in range(0, time_steps-1):
         for idx, vertex_str in enumerate(enum):
@@ -80,61 +178,37 @@ def generate_glns_instance(wh_type, products):
                     # Regular vertex in t-1 to the special pick vertex edge
                     gtsp_distances[time_steps + ((time-1) * layer_size) + (regular_idx - 1),
                                    time_steps + (time * layer_size) + (idx - 1)] = 1
-                    # print("Written enge from " + str(time_steps + ((time-1) * layer_size) + (regular_idx - 1)) + "to " + str(time_steps + (time * layer_size) + (idx - 1)))
                     if time < time_steps - 4:
                         # This pick vertex edge into regular again in t+15
                         gtsp_distances[time_steps + (time * layer_size) + (idx - 1),
                                        time_steps + ((time+3) * layer_size) + (regular_idx - 1)] = 3
+    return gtsp_distances
 
-    out = io.open("output", 'w+')
-    out.write("NAME: 65rbg323" + "\n")
-    out.write("TYPE: AGTSP" + "\n")
-    out.write("COMMENT: Stacker crane application (Ascheuer)" + "\n")
-    out.write("DIMENSION: " + str(final_size) + "\n")
-    out.write("GTSP_SETS: " + str(time_steps-1 + len(products) + 1) + "\n")
-    out.write("EDGE_WEIGHT_TYPE: EXPLICIT" + "\n")
-    out.write("EDGE_WEIGHT_FORMAT: FULL_MATRIX " + "\n")
-    out.write("EDGE_WEIGHT_SECTION" + "\n")
-    for x in range(final_size):
-        line = ""
-        for y in range(final_size):
-            line += " " + str(gtsp_distances[x, y])
-        line += "\n"
-        out.write(line)
-
-    out.write("GTSP_SET_SECTION:" + "\n")
 
-    # Add depot.
-    out.write("1 1 -1\n")
-    set_idx = 2
+def verify_glns_matrix(graph, time_steps):
+    """ Checks that build_glns_matrix is bit-identical to the reference loop implementation.
 
-    # Add set for each graph time step.
-    for i in range(1, time_steps):
-        out.write(str(set_idx) + " ")
-        out.write(str(i+1) + " ")
-        for j in range(1, len(orig_vertices)):
-            out.write(str(time_steps + ((i-1) * layer_size) + j) + " ")
-        out.write("-1\n")
-        set_idx += 1
+    :param graph: Warehouse graph including the special picking vertices.
+    :param time_steps: Number of time layers, keep it small - the reference is slow.
+    :return: True if both matrices are identical.
+    """
+    fast = build_glns_matrix(graph, time_steps)
+    reference = _build_glns_matrix_loop(graph, time_steps)
+    return fast.dtype == reference.dtype and np.array_equal(fast, reference)
 
-    index_offset = len(orig_vertices)
-    # Add set for each items picking locations.
-    for i in range(len(special_vertices)):
-        out.write(str(set_idx) + " ")
-        set_idx += 1
-        for vertex in special_vertices[i]:
-            for time in range(1, time_steps):
-                out.write(str(time_steps + ((time-1) * layer_size) + index_offset) + " ")
-            index_offset += 1
-        out.write("-1\n")
 
-    out.write("EOF" + "\n")
-    out.close()
-    print()
+def get_reverse_index(i, codec=None):
+    """ Decodes a vertex index of the GLNS matrix into its time layer and base vertex.
 
+    Thin wrapper over GlnsCodec.decode, which decodes whole arrays.
 
-def get_reverse_index(i):
-    i = i - 51
-    time = i // 75
-    index = i % 75
-    return time, index
+    :param i: 0-based index of the vertex in the matrix.
+    :param codec: GlnsCodec of the instance, the former fixed 51 time steps and 75 vertices in
+        a layer if None.
+    :return: Tuple: (time, index of the vertex in the layer), the depot has index -1.
+    """
+    if codec is None:
+        codec = glns_codec.GlnsCodec(51, 75, np.zeros(0, dtype=str), np.zeros(0, dtype=np.int64),
+                                     np.zeros(0, dtype=np.int64))
+    times, vertices = codec.decode(np.array([i + 1]))
+    return int(times[0]), int(vertices[0]) - 1
@@ -1,22 +1,29 @@
-import io
 import random
 
-import networkx as nx
-
+import distance_matrix as dm
+import instance_writer as iw
 import test_warehouse_generator as twg
 
 
-def generate_gtsp_random_instance(wh_type, pick_locations, classes, file_path):
+def generate_gtsp_random_instance(wh_type, pick_locations, classes, file_path, compress=False, cache=None, seed=None):
     """ Generates a random GTSP instance for testing purposes.
 
     :param wh_type:
     :param pick_locations:
     :param classes:
     :param file_path:
-    :return:
+    :param compress: Whether to gzip the output file.
+    :param cache: LayoutCache to load the layout and distances from, requires seed.
+    :param seed: Seed of the layout, random if None.
+    :return: WriteStats of the written file.
     """
-    graph = twg.generate_warehouse_graph(wh_type)
-    vertices = [vertex for vertex in graph.nodes]
+    if cache is not None:
+        graph = cache.get_layout(wh_type, seed)
+        distances = cache.get_distances(wh_type, seed)
+    else:
+        graph = twg.build_warehouse(wh_type, None if seed is None else twg.layout_generator(wh_type, seed))
+        distances = dm.distance_matrix(graph)
+    vertices = graph.node_names()
 
     # Generate random sample of vertices
     picking_vertices = random.sample(range(1, len(vertices)), pick_locations)
@@ -36,18 +43,16 @@ def generate_gtsp_random_instance(wh_type, pick_locations, classes, file_path):
                 divider += step
                 i += 1
 
-    file = io.open(file_path, "w+")
+    file = iw.InstanceWriter(file_path, compress)
     file.write(str(len(vertices)) + "\n")
     file.write(str(len(picking_vertices)+1) + "\n")
     file.write(str(classes+1) + "\n")
 
-    for i, vertex in enumerate(vertices):
-        line = ""
-        for j, vertex_2 in enumerate(vertices):
-            line += str(nx.algorithms.shortest_path_length(graph, vertex, vertex_2)) + " "
-        file.write(line + "\n")
+    file.write_matrix(distances, "%d ")
     file.write("0 0\n")
 
     for i in range(len(picking_vertices)):
         file.write(str(picking_vertices[i]) + " " + str(picking_vertices_classes[i]) + "\n")
-    file.close()
+    stats = file.close()
+    print("GTSP instance written: " + str(stats))
+    return stats
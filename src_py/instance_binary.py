@@ -0,0 +1,216 @@
+"""Versioned binary container of warehouse instances.
+
+Layout of the file:
+    header      - magic, format version, offset and length of the table of contents
+    blocks      - each block is a complete .npy stream starting at a 64 byte aligned offset
+    toc         - JSON with the instance metadata and dtype, shape and offset of every block
+
+Blocks are read by np.memmap without copying. The container holds the graph as CSR arrays,
+the items stored in the shelves, the orders of the agents and optionally a distance matrix.
+"""
+import io
+import json
+import struct
+
+import numpy as np
+
+import distance_matrix as dm
+
+MAGIC = b"WHINST\x00\x00"
+VERSION = 1
+ALIGNMENT = 64
+# magic, version, reserved, toc offset, toc length
+HEADER = struct.Struct("<8sIIQQ")
+
+VERTEX_TYPES = ("Depot", "Steiner", "Shelf")
+
+
+def _pad(file):
+    padding = -file.tell() % ALIGNMENT
+    file.write(b"\x00" * padding)
+
+
+def write_instance(file_path, blocks, meta=None):
+    """ Writes the arrays into a binary instance container.
+
+    :param file_path: Path to the output file.
+    :param blocks: Dict of block name -> numpy array.
+    :param meta: JSON serializable dict of instance metadata.
+    """
+    toc = {"version": VERSION, "meta": meta or {}, "blocks": {}}
+    with io.open(file_path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, 0, 0, 0))
+        for name, array in blocks.items():
+            array = np.ascontiguousarray(array)
+            _pad(file)
+            offset = file.tell()
+            # The .npy header is padded to a multiple of 64 bytes, so the data stays aligned.
+            np.lib.format.write_array(file, array, allow_pickle=False)
+            toc["blocks"][name] = {
+                "offset": offset,
+                "data_offset": file.tell() - array.nbytes,
+                "dtype": array.dtype.str,
+                "shape": list(array.shape),
+            }
+        _pad(file)
+        toc_offset = file.tell()
+        toc_data = json.dumps(toc).encode("utf-8")
+        file.write(toc_data)
+        file.seek(0)
+        file.write(HEADER.pack(MAGIC, VERSION, 0, toc_offset, len(toc_data)))
+
+
+def read_instance(file_path):
+    """ Opens a binary instance container, every block is memory-mapped.
+
+    :param file_path: Path to the container.
+    :return: Tuple: (meta dict, dict of block name -> read-only np.memmap).
+    """
+    with io.open(file_path, "rb") as file:
+        magic, version, _, toc_offset, toc_length = HEADER.unpack(file.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError("Not a binary warehouse instance: " + str(file_path))
+        if version > VERSION:
+            raise ValueError("Unsupported instance format version " + str(version))
+        file.seek(toc_offset)
+        toc = json.loads(file.read(toc_length).decode("utf-8"))
+
+    blocks = {}
+    for name, block in toc["blocks"].items():
+        shape = tuple(block["shape"])
+        if 0 in shape:
+            blocks[name] = np.empty(shape, dtype=block["dtype"])
+        else:
+            blocks[name] = np.memmap(file_path, dtype=block["dtype"], mode="r",
+                                     offset=block["data_offset"], shape=shape)
+    return toc["meta"], blocks
+
+
+def _offsets(lengths):
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return offsets
+
+
+def _order_blocks(agents_orders):
+    """ Flattens the nested agents -> orders -> classes -> locations lists into CSR arrays.
+
+    :param agents_orders: Nested lists, order is a tuple (source, target, classes).
+    :return: Dict of blocks.
+    """
+    orders = [order for agent in agents_orders for order in agent]
+    classes = [item_class for _, _, order_classes in orders for item_class in order_classes]
+    locations = [location for item_class in classes for location in item_class]
+    return {
+        "agent_orders": _offsets([len(agent) for agent in agents_orders]),
+        "order_endpoints": np.array([(source, target) for source, target, _ in orders],
+                                    dtype=np.int32).reshape(-1, 2),
+        "order_classes": _offsets([len(order_classes) for _, _, order_classes in orders]),
+        "class_locations": _offsets([len(item_class) for item_class in classes]),
+        "locations": np.array(locations, dtype=np.int32).reshape(-1, 3),
+    }
+
+
+def parse_text_instance(file_path):
+    """ Parses the whole_instance.txt format into arrays.
+
+    :param file_path: Path to the text instance.
+    :return: Tuple: (meta dict, dict of blocks).
+    """
+    file = io.open(file_path, "r")
+    description = file.readline().strip()
+    vertex_count = int(file.readline().split()[1])
+    height = int(file.readline().split()[3])
+
+    vertex_dict = {}
+    vertex_types = np.zeros(vertex_count, dtype=np.int8)
+    shelf_vertices = []
+    shelf_items = []
+    for i in range(vertex_count):
+        tokens = file.readline().split()
+        vertex_dict[tokens[1]] = i
+        vertex_types[i] = VERTEX_TYPES.index(tokens[2])
+        if tokens[2] == "Shelf":
+            left = file.readline().replace(",", " ").split()
+            right = file.readline().replace(",", " ").split()
+            shelf_vertices.append(i)
+            shelf_items.append(left + right)
+
+    # Parse edges.
+    file.readline()
+    edges = [edge.split(",") for edge in file.readline().split()]
+    edges = np.array([(vertex_dict[u], vertex_dict[v]) for u, v in edges], dtype=np.int32).reshape(-1, 2)
+    indptr, indices = csr_from_edges(edges, vertex_count)
+
+    # Parse agents and orders.
+    agents_orders = []
+    agents = int(file.readline().split()[1])
+    for i in range(agents):
+        orders = int(file.readline().split()[3])
+        agents_orders.append([])
+        for j in range(orders):
+            tokens = file.readline().split()
+            classes = []
+            for k in range(int(tokens[3])):
+                classes.append([tuple(int(value) for value in location.split(","))
+                                for location in file.readline().split()])
+            agents_orders[i].append((int(tokens[5]), int(tokens[7]), classes))
+    file.close()
+
+    blocks = {
+        "vertex_types": vertex_types,
+        "vertex_names": np.array(list(vertex_dict), dtype="U"),
+        "edges": edges,
+        "indptr": indptr,
+        "indices": indices,
+        "shelf_vertices": np.array(shelf_vertices, dtype=np.int32),
+        "shelf_items": np.array(shelf_items, dtype=np.int32).reshape(-1, 2, height, 2),
+    }
+    blocks.update(_order_blocks(agents_orders))
+    meta = {"description": description, "vertices": vertex_count, "height": height, "agents": agents}
+    return meta, blocks
+
+
+def csr_from_edges(edges, vertex_count):
+    """ Builds the undirected CSR adjacency from an edge list.
+
+    :param edges: int array of shape (edges, 2).
+    :param vertex_count: Number of vertices.
+    :return: Tuple: (indptr, indices) int32 arrays.
+    """
+    src = np.concatenate((edges[:, 0], edges[:, 1]))
+    dst = np.concatenate((edges[:, 1], edges[:, 0]))
+    order = np.argsort(src, kind="stable")
+    indptr = _offsets(np.bincount(src, minlength=vertex_count)).astype(np.int32)
+    return indptr, dst[order].astype(np.int32)
+
+
+def convert_text_instance(text_path, binary_path, distances=False):
+    """ Converts the whole_instance.txt format into the binary container.
+
+    :param text_path: Path to the text instance.
+    :param binary_path: Path to the output container.
+    :param distances: Whether to store the all-pairs distance matrix as well.
+    """
+    meta, blocks = parse_text_instance(text_path)
+    if distances:
+        neighbors = dm.neighbor_table_from_csr(blocks["indptr"], blocks["indices"])
+        blocks["distances"] = dm.distance_matrix(None, neighbors=neighbors)
+    write_instance(binary_path, blocks, meta)
+
+
+def convert_gtsp_instance(text_path, binary_path):
+    """ Converts a GTSP matrix instance from gtsp_instance_generator into the binary container.
+
+    :param text_path: Path to the text GTSP instance.
+    :param binary_path: Path to the output container.
+    """
+    file = io.open(text_path, "r")
+    vertex_count = int(file.readline())
+    pick_count = int(file.readline())
+    classes = int(file.readline())
+    distances = np.loadtxt(file, dtype=np.int32, max_rows=vertex_count).reshape(vertex_count, vertex_count)
+    picks = np.loadtxt(file, dtype=np.int32, max_rows=pick_count).reshape(pick_count, 2)
+    file.close()
+    write_instance(binary_path, {"distances": distances, "pick_vertices": picks[:, 0], "pick_classes": picks[:, 1]},
+                   {"vertices": vertex_count, "classes": classes})
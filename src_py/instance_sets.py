@@ -0,0 +1,101 @@
+"""Instances split into a static layout file and separate order set files.
+
+A directory holds layout.txt, the layout section of whole_instance.txt, and one
+orders_<name>.txt per order set, the orders section. The C# InstanceParser.Parse(layout,
+orders) overload reads the pair directly, assemble concatenates them into a single
+whole_instance.txt file. Changing the orders rewrites only the order set file, so the
+cost does not depend on the size of the warehouse.
+"""
+import io
+import os
+import shutil
+from pathlib import Path
+
+import test_warehouse_generator as twg
+
+
+class InstanceSet:
+    """Directory of a layout and its order sets."""
+
+    def __init__(self, root):
+        """ Opens the directory, it is created if missing.
+
+        :param root: Directory of the instance set.
+        """
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.layout_path = self.root.joinpath("layout.txt")
+
+    def orders_path(self, name):
+        return self.root.joinpath("orders_" + str(name) + ".txt")
+
+    def has_layout(self):
+        return self.layout_path.exists()
+
+    def write_layout(self, graph, wh_type):
+        """ Writes the layout section of the graph, replacing the previous layout.
+
+        :param graph: WarehouseGraph.
+        :param wh_type: The warehouse type, written into the header line only.
+        """
+        self._write(self.layout_path, lambda file: twg.write_layout(graph, wh_type, file))
+
+    def write_orders(self, name, agents_orders, bounds=None):
+        """ Writes the order set, replacing the previous one of the same name.
+
+        :param name: Name of the order set.
+        :param agents_orders: List of orders of each agent, see test_warehouse_generator.generate_orders.
+        :param bounds: OrderBounds of the orders, see order_bounds.compute_bounds.
+        """
+        self._write(self.orders_path(name), lambda file: twg.write_orders(agents_orders, file, bounds))
+
+    def append_orders(self, name, agents_orders, bounds=None):
+        """ Adds agents with their orders to the order set, it is created if missing.
+
+        :param name: Name of the order set.
+        :param agents_orders: List of orders of each new agent.
+        :param bounds: OrderBounds of the new orders, computed with first_agent=agents(name).
+        """
+        agents = self.agents(name)
+        if agents == 0:
+            self.write_orders(name, agents_orders, bounds)
+            return
+
+        path = self.orders_path(name)
+
+        def write(file):
+            # Only the number of agents changes in the existing orders.
+            with io.open(path) as old_file:
+                old_file.readline()
+                file.write("Agents: " + str(agents + len(agents_orders)) + "\n")
+                shutil.copyfileobj(old_file, file)
+            twg.write_agents(agents_orders, file, first_agent=agents, bounds=bounds)
+        self._write(path, write)
+
+    def agents(self, name):
+        """ Returns the number of agents of the order set, 0 if it does not exist. """
+        path = self.orders_path(name)
+        if not path.exists():
+            return 0
+        with io.open(path) as file:
+            return int(file.readline().split()[1])
+
+    def remove_orders(self, name):
+        self.orders_path(name).unlink(missing_ok=True)
+
+    def assemble(self, name, file_path):
+        """ Writes the layout and the order set into a single whole_instance.txt file.
+
+        :param name: Name of the order set.
+        :param file_path: Path to the output file.
+        """
+        with open(file_path, "wb") as file:
+            for path in (self.layout_path, self.orders_path(name)):
+                with open(path, "rb") as part:
+                    shutil.copyfileobj(part, file)
+
+    def _write(self, path, write):
+        temp_path = path.with_name(path.name + "." + str(os.getpid()) + ".tmp")
+        with io.open(temp_path, "w") as file:
+            write(file)
+        os.replace(temp_path, path)
@@ -0,0 +1,111 @@
+"""Buffered writer of large instance files.
+
+Matrix rows are formatted in blocks by a single % operation per block and written into a
+buffered binary handle, optionally gzip compressed.
+"""
+import gzip
+import io
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+import instrumentation
+
+BUFFER_SIZE = 1 << 22
+# Maximal number of matrix cells formatted at once.
+BLOCK_CELLS = 1 << 20
+
+
+@dataclass
+class WriteStats:
+    """Amount of written (uncompressed) data and the time it took."""
+
+    bytes_written: int = 0
+    seconds: float = 0.0
+
+    @property
+    def bytes_per_second(self):
+        return self.bytes_written / self.seconds if self.seconds > 0 else 0.0
+
+    def __str__(self):
+        return f"{self.bytes_written / 1e6:.1f} MB in {self.seconds:.2f} s " \
+               f"({self.bytes_per_second / 1e6:.1f} MB/s)"
+
+
+def format_block(block, fmt):
+    """ Formats a 2D block of integers, each value by fmt and each row ended by a newline.
+
+    :param block: 2D array.
+    :param fmt: Format of a single value, e.g. "%d " or " %d".
+    :return: Formatted block as a string.
+    """
+    rows, cols = block.shape
+    return ((fmt * cols + "\n") * rows) % tuple(block.ravel().tolist())
+
+
+def row_blocks(matrix, block_cells=BLOCK_CELLS):
+    """ Splits a 2D matrix into blocks of whole rows.
+
+    :param matrix: 2D array.
+    :param block_cells: Maximal number of cells in a block.
+    :return: Generator of 2D arrays.
+    """
+    block_rows = max(1, block_cells // max(1, matrix.shape[1]))
+    for start in range(0, matrix.shape[0], block_rows):
+        yield matrix[start:start + block_rows]
+
+
+class InstanceWriter:
+    """Writes text instance files through a buffered binary (or gzip) handle."""
+
+    def __init__(self, file_path, compress=False):
+        """ Opens the file for writing.
+
+        :param file_path: Path to the output file, ".gz" is appended if compressed.
+        :param compress: Whether to gzip the output.
+        """
+        file_path = str(file_path)
+        if compress:
+            if not file_path.endswith(".gz"):
+                file_path += ".gz"
+            self.file = gzip.open(file_path, "wb", compresslevel=6)
+        else:
+            self.file = io.open(file_path, "wb", buffering=BUFFER_SIZE)
+        self.file_path = file_path
+        self.stats = WriteStats()
+        self._start = time.perf_counter()
+
+    def write(self, text):
+        data = text.encode("ascii")
+        self.file.write(data)
+        self.stats.bytes_written += len(data)
+
+    def write_matrix(self, blocks, fmt):
+        """ Writes matrix rows block by block.
+
+        :param blocks: 2D array, or an iterable of 2D blocks of rows.
+        :param fmt: Format of a single value, e.g. "%d " or " %d".
+        """
+        if isinstance(blocks, np.ndarray):
+            blocks = row_blocks(blocks)
+        for block in blocks:
+            block = np.atleast_2d(block)
+            self.write(format_block(block, fmt))
+            instrumentation.count("matrix_cells", block.size)
+
+    def close(self):
+        """ Closes the file.
+
+        :return: WriteStats of the whole file.
+        """
+        if not self.file.closed:
+            self.file.close()
+            self.stats.seconds = time.perf_counter() - self._start
+        return self.stats
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,199 @@
+"""Opt-in instrumentation of the generator and parser stages.
+
+Disabled by default, every call then returns right after checking a module flag. Enable it
+by enable() or by the environment variable WAREHOUSE_INSTRUMENTATION:
+
+- "1" records the stage times and the counters,
+- "memory" also traces the peak memory of every stage by tracemalloc, which is slow.
+
+With WAREHOUSE_INSTRUMENTATION_OUTPUT set, the results are exported at exit into the path,
+as JSON if it ends by ".json", otherwise as CSV.
+
+Usage:
+    with instrumentation.stage("find_items"):
+        ...
+    instrumentation.count("nodes", len(graph))
+"""
+import atexit
+import csv
+import json
+import multiprocessing
+import os
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+
+ENV_VARIABLE = "WAREHOUSE_INSTRUMENTATION"
+OUTPUT_ENV_VARIABLE = "WAREHOUSE_INSTRUMENTATION_OUTPUT"
+CSV_COLUMNS = ("kind", "name", "calls", "total_ms", "max_ms", "peak_bytes", "value")
+
+_enabled = False
+_memory = False
+_stages = {}
+_counters = {}
+# Open stages with tracemalloc, innermost last.
+_open = []
+
+
+@dataclass
+class StageStats:
+    """Accumulated measurements of a stage."""
+
+    calls: int = 0
+    seconds: float = 0.0
+    max_seconds: float = 0.0
+    # Largest traced memory above the memory at the stage start, None without memory tracing.
+    peak_bytes: int = None
+
+
+class _Stage:
+    __slots__ = ("name", "start", "memory_start", "memory_peak")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        if _memory:
+            # The peak so far belongs to the enclosing stage.
+            current, peak = tracemalloc.get_traced_memory()
+            if _open:
+                _open[-1].memory_peak = max(_open[-1].memory_peak, peak)
+            tracemalloc.reset_peak()
+            self.memory_start, self.memory_peak = current, current
+            _open.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        seconds = time.perf_counter() - self.start
+        peak_bytes = None
+        if _memory and _open and _open[-1] is self:
+            _open.pop()
+            peak = max(self.memory_peak, tracemalloc.get_traced_memory()[1])
+            peak_bytes = peak - self.memory_start
+            if _open:
+                _open[-1].memory_peak = max(_open[-1].memory_peak, peak)
+        _add(self.name, seconds, peak_bytes)
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+def _add(name, seconds, peak_bytes=None):
+    stats = _stages.get(name)
+    if stats is None:
+        stats = _stages[name] = StageStats()
+    stats.calls += 1
+    stats.seconds += seconds
+    stats.max_seconds = max(stats.max_seconds, seconds)
+    if peak_bytes is not None:
+        stats.peak_bytes = peak_bytes if stats.peak_bytes is None else max(stats.peak_bytes, peak_bytes)
+
+
+def enable(memory=False):
+    """ Starts recording the stages and counters.
+
+    :param memory: Also trace the peak memory of the stages by tracemalloc.
+    """
+    global _enabled, _memory
+    _enabled = True
+    _memory = memory
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def disable():
+    """ Stops recording, the recorded results are kept. """
+    global _enabled, _memory
+    if _memory and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _enabled = _memory = False
+    _open.clear()
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    """ Clears the recorded results. """
+    _stages.clear()
+    _counters.clear()
+
+
+def stage(name):
+    """ Returns a context manager timing the stage, a shared no-op one if disabled.
+
+    :param name: Name of the stage, the measurements of all its calls are accumulated.
+    """
+    return _Stage(name) if _enabled else _NULL_STAGE
+
+
+def add_time(name, seconds):
+    """ Records a stage measured elsewhere, e.g. in a worker process. """
+    if _enabled:
+        _add(name, seconds)
+
+
+def count(name, value=1):
+    """ Adds the value to the counter. """
+    if _enabled:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def results():
+    """ Returns the recorded results.
+
+    :return: Dict: {"stages": {name: StageStats as dict}, "counters": {name: value}}.
+    """
+    return {"stages": {name: asdict(stats) for name, stats in _stages.items()}, "counters": dict(_counters)}
+
+
+def export_json(path):
+    with open(path, "w") as file:
+        json.dump(results(), file, indent=2)
+
+
+def export_csv(path):
+    """ Writes a row per stage and per counter, times are in milliseconds. """
+    with open(path, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(CSV_COLUMNS)
+        for name, stats in _stages.items():
+            writer.writerow(("stage", name, stats.calls, round(stats.seconds * 1000, 3),
+                             round(stats.max_seconds * 1000, 3), "" if stats.peak_bytes is None else stats.peak_bytes,
+                             ""))
+        for name, value in _counters.items():
+            writer.writerow(("counter", name, "", "", "", "", value))
+
+
+def export(path):
+    """ Exports the results as JSON if the path ends by ".json", otherwise as CSV. """
+    if str(path).endswith(".json"):
+        export_json(path)
+    else:
+        export_csv(path)
+
+
+def _enable_from_environment():
+    setting = os.environ.get(ENV_VARIABLE, "").strip().lower()
+    if setting in ("", "0", "false", "off"):
+        return
+    enable(memory=setting == "memory")
+    output = os.environ.get(OUTPUT_ENV_VARIABLE)
+    # Worker processes inherit the environment, only the main process exports.
+    if output and multiprocessing.parent_process() is None:
+        atexit.register(export, output)
+
+
+_enable_from_environment()
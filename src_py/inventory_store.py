@@ -0,0 +1,209 @@
+"""Date-partitioned on-disk store of the inventory balance snapshots.
+
+Every day of the balance is a partition of (location, item) records sorted by location
+and item, with the location and item ids encoded into the codes of the InventoryTable
+categories. Every keyframe_interval-th partition is a keyframe holding the whole balance
+of the day, the others are deltas holding only the records that changed since the
+previous day, removed records are marked as deleted. Partitions are memory-mapped .npy
+files, so a lookup reads only the keyframe and deltas up to the requested day.
+"""
+import json
+from pathlib import Path
+
+import numpy as np
+
+# Increase whenever the layout of the store files changes.
+STORE_VERSION = 1
+KEYFRAME_INTERVAL = 7
+QUANTITIES = ("available_qty", "onhand_qty", "transi_qty", "allocated_qty", "suspense_qty")
+RECORD_DTYPE = np.dtype([("location", np.int32), ("item", np.int32), ("deleted", np.bool_)]
+                        + [(name, np.float64) for name in QUANTITIES])
+
+
+def _keys(records, items):
+    return records["location"].astype(np.int64) * items + records["item"]
+
+
+def _merge(state, delta, items):
+    """ Applies a delta partition to the balance of the previous day.
+
+    :param state: Records sorted by (location, item).
+    :param delta: Records sorted by (location, item), overriding the state.
+    :param items: Number of item categories.
+    :return: Records sorted by (location, item) without the deleted ones.
+    """
+    records = np.concatenate([state, delta])
+    keys = _keys(records, items)
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+    last = np.ones(len(keys), dtype=bool)
+    last[:-1] = keys[:-1] != keys[1:]
+    records = records[order[last]]
+    return records[~records["deleted"]]
+
+
+def _delta(previous, current, items):
+    """ Computes the records of current that differ from previous and the removed ones. """
+    previous_keys = _keys(previous, items)
+    current_keys = _keys(current, items)
+    idx = np.searchsorted(previous_keys, current_keys).clip(max=max(len(previous) - 1, 0))
+    changed = np.ones(len(current), dtype=bool)
+    if len(previous):
+        changed = previous_keys[idx] != current_keys
+        for name in QUANTITIES:
+            old, new = previous[name][idx], current[name]
+            changed |= (old != new) & ~(np.isnan(old) & np.isnan(new))
+
+    removed = previous[~np.isin(previous_keys, current_keys)].copy()
+    removed["deleted"] = True
+    delta = np.concatenate([current[changed], removed])
+    return delta[np.argsort(_keys(delta, items), kind="stable")]
+
+
+def _day_records(table, rows):
+    """ Converts rows of an InventoryTable into records, the last row of a duplicate key wins. """
+    records = np.zeros(len(rows), dtype=RECORD_DTYPE)
+    records["location"] = table.location_id.codes[rows]
+    records["item"] = table.item_id.codes[rows]
+    for name in QUANTITIES:
+        records[name] = table.columns[name][rows]
+    return _merge(records[:0], records, len(table.item_id.categories))
+
+
+class InventoryStore:
+    """Inventory balance partitioned by date, see the module docstring."""
+
+    def __init__(self, root):
+        """ Opens the store, partitions are loaded on first use.
+
+        :param root: Directory of the store.
+        """
+        self.root = Path(root)
+        with np.load(self.root.joinpath("index.npz")) as index:
+            meta = json.loads(str(index["meta"]))
+            if meta["version"] != STORE_VERSION:
+                raise ValueError(f"Unsupported inventory store version {meta['version']}.")
+            self.dates = index["dates"]
+            self.keyframes = np.flatnonzero(index["keyframe"])
+            self.locations = index["locations"]
+            self.items = index["items"]
+        self._partitions = {}
+
+    @classmethod
+    def build(cls, table, root, keyframe_interval=KEYFRAME_INTERVAL):
+        """ Writes the store of an InventoryTable.
+
+        :param table: InventoryTable, rows with a missing date are skipped.
+        :param root: Directory of the store, created if missing.
+        :param keyframe_interval: Number of days between the keyframes.
+        :return: InventoryStore.
+        """
+        root = Path(root)
+        root.mkdir(parents=True, exist_ok=True)
+        items = len(table.item_id.categories)
+        valid = np.flatnonzero(~np.isnat(table.date))
+        order = valid[np.argsort(table.date[valid], kind="stable")]
+        dates, starts = np.unique(table.date[order], return_index=True)
+        keyframe = np.arange(len(dates)) % keyframe_interval == 0
+
+        state = np.zeros(0, dtype=RECORD_DTYPE)
+        for day, rows in enumerate(np.split(order, starts[1:])):
+            current = _day_records(table, rows)
+            records = current if keyframe[day] else _delta(state, current, items)
+            state = current
+            np.save(root.joinpath(f"part_{day:05d}.npy"), records)
+            by_item = np.argsort(records["item"], kind="stable")
+            np.save(root.joinpath(f"part_{day:05d}_item_rows.npy"), by_item.astype(np.int64))
+            np.save(root.joinpath(f"part_{day:05d}_item_codes.npy"), records["item"][by_item])
+
+        meta = {"version": STORE_VERSION, "keyframe_interval": keyframe_interval}
+        np.savez(root.joinpath("index.npz"), meta=np.array(json.dumps(meta)), dates=dates, keyframe=keyframe,
+                 locations=table.location_id.categories, items=table.item_id.categories)
+        return cls(root)
+
+    def _partition(self, day):
+        if day not in self._partitions:
+            self._partitions[day] = tuple(
+                np.load(self.root.joinpath(f"part_{day:05d}{suffix}.npy"), mmap_mode="r")
+                for suffix in ("", "_item_rows", "_item_codes"))
+        return self._partitions[day]
+
+    def _days(self, date):
+        """ Returns the partitions to apply for the balance on the date, keyframe first. """
+        day = np.searchsorted(self.dates, np.datetime64(date, "D"), side="right") - 1
+        if day < 0:
+            return range(0)
+        keyframe = self.keyframes[np.searchsorted(self.keyframes, day, side="right") - 1]
+        return range(keyframe, day + 1)
+
+    def _code(self, categories, value):
+        idx = np.searchsorted(categories, value)
+        return int(idx) if idx < len(categories) and categories[idx] == value else -1
+
+    def _lookup(self, date, select):
+        state = np.zeros(0, dtype=RECORD_DTYPE)
+        for day in self._days(date):
+            state = _merge(state, select(*self._partition(day)), len(self.items))
+        return state
+
+    def snapshot(self, date):
+        """ Returns the balance on the date, that is on the last stored day not after it.
+
+        :param date: Date, e.g. "2020-01-31" or np.datetime64.
+        :return: RECORD_DTYPE array sorted by (location, item).
+        """
+        return self._lookup(date, lambda records, item_rows, item_codes: np.asarray(records))
+
+    def at_location(self, location_id, date):
+        """ Returns the balance of a single location on the date.
+
+        :param location_id: Location id.
+        :param date: Date.
+        :return: RECORD_DTYPE array sorted by item.
+        """
+        code = self._code(self.locations, location_id)
+
+        def select(records, item_rows, item_codes):
+            locations = records["location"]
+            return np.asarray(records[np.searchsorted(locations, code):np.searchsorted(locations, code, "right")])
+        return self._lookup(date, select) if code >= 0 else np.zeros(0, dtype=RECORD_DTYPE)
+
+    def of_item(self, item_id, date):
+        """ Returns the balance of a single item over all locations on the date.
+
+        :param item_id: Item id.
+        :param date: Date.
+        :return: RECORD_DTYPE array sorted by location.
+        """
+        code = self._code(self.items, item_id)
+
+        def select(records, item_rows, item_codes):
+            rows = item_rows[np.searchsorted(item_codes, code):np.searchsorted(item_codes, code, "right")]
+            return records[np.sort(rows)]
+        return self._lookup(date, select) if code >= 0 else np.zeros(0, dtype=RECORD_DTYPE)
+
+    def between(self, start, end):
+        """ Yields the balance of every stored day in [start, end].
+
+        The balance of start is built from its keyframe, the next days apply a single delta.
+
+        :param start: First date.
+        :param end: Last date, inclusive.
+        :return: Generator of (date, RECORD_DTYPE array) tuples.
+        """
+        start = np.datetime64(start, "D")
+        first = np.searchsorted(self.dates, start)
+        last = np.searchsorted(self.dates, np.datetime64(end, "D"), side="right")
+        if first >= last:
+            return
+        state = self.snapshot(self.dates[first])
+        yield self.dates[first], state
+        for day in range(first + 1, last):
+            records = np.asarray(self._partition(day)[0])
+            state = records if day in self.keyframes else _merge(state, records, len(self.items))
+            yield self.dates[day], state
+
+    def decode(self, records):
+        """ Converts records into (location id, item id, available qty) tuples. """
+        return list(zip(self.locations[records["location"]].tolist(), self.items[records["item"]].tolist(),
+                        records["available_qty"].tolist()))
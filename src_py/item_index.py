@@ -0,0 +1,99 @@
+"""Inverted index from items to their storage locations.
+
+The index is in CSR form: locations of item i are records[offsets[i]:offsets[i+1]], each
+record is (vertex, side, height), the same triple as the positions from find_items.
+"""
+import numpy as np
+
+from warehouse_graph import WarehouseGraph
+
+
+def _networkx_item_records(graph):
+    """ Lists every stored item of a networkx warehouse graph, see WarehouseGraph.item_records. """
+    item_ids, records = [], []
+    for idx, vertex in enumerate(graph.nodes):
+        vertex = graph.nodes[vertex]
+        if vertex["type"] != "Shelf node":
+            continue
+        for height, (item1, item2) in enumerate(zip(vertex["left"], vertex["right"])):
+            item_ids += [int(item1[0]), int(item2[0])]
+            records += [(idx, 0, height), (idx, 1, height)]
+    return np.array(item_ids, dtype=np.int64), np.array(records, dtype=np.int32).reshape(-1, 3)
+
+
+class ItemIndex:
+    """Item -> (vertex, side, height) records of a warehouse."""
+
+    def __init__(self, offsets, records):
+        self.offsets = offsets
+        self.records = records
+        self.stocked_items = np.flatnonzero(np.diff(offsets))
+        # Item 0 marks an empty position.
+        self.stocked_items = self.stocked_items[self.stocked_items > 0]
+
+    @classmethod
+    def from_warehouse(cls, graph):
+        """ Builds the index of a warehouse.
+
+        Locations of each item keep the order of find_items.
+
+        :param graph: WarehouseGraph or networkx graph.
+        :return: ItemIndex.
+        """
+        if isinstance(graph, WarehouseGraph):
+            item_ids, records = graph.item_records()
+        else:
+            item_ids, records = _networkx_item_records(graph)
+        order = np.argsort(item_ids, kind="stable")
+        offsets = np.zeros(item_ids.max(initial=0) + 2, dtype=np.int64)
+        np.cumsum(np.bincount(item_ids), out=offsets[1:])
+        return cls(offsets, records[order])
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def locations(self, item):
+        """ Returns the records of all locations of the item.
+
+        :param item: Item id.
+        :return: int32 array of shape (locations, 3).
+        """
+        if item >= len(self):
+            return self.records[:0]
+        return self.records[self.offsets[item]:self.offsets[item+1]]
+
+    def positions(self, item):
+        """ Returns the locations of the item as a list of (vertex, side, height) tuples.
+
+        :param item: Item id.
+        :return: List of tuples.
+        """
+        return [tuple(record) for record in self.locations(item).tolist()]
+
+    def sample_orders(self, orders, rng, min_size=6, max_size=12):
+        """ Samples random orders of distinct stocked items.
+
+        :param orders: Number of orders.
+        :param rng: np.random.Generator.
+        :param min_size: Minimal number of items in an order.
+        :param max_size: Maximal number of items in an order, inclusive.
+        :return: Tuple: (order offsets, item ids), items of order i are items[offsets[i]:offsets[i+1]].
+        """
+        if not len(self.stocked_items):
+            raise ValueError("No item is stocked in the warehouse.")
+        # An order cannot hold more distinct items than there are stocked.
+        max_size = min(max_size, len(self.stocked_items))
+        min_size = min(min_size, max_size)
+        sizes = rng.integers(min_size, max_size+1, size=orders)
+        draws = rng.choice(self.stocked_items, size=(orders, max_size))
+        # Redraw the items already drawn at a lower position of the same order.
+        lower = np.arange(max_size)[:, None] < np.arange(max_size)[None, :]
+        while True:
+            repeated = ((draws[:, :, None] == draws[:, None, :]) & lower).any(axis=1)
+            if not repeated.any():
+                break
+            draws[repeated] = rng.choice(self.stocked_items, size=np.count_nonzero(repeated))
+
+        offsets = np.zeros(orders + 1, dtype=np.int64)
+        np.cumsum(sizes, out=offsets[1:])
+        return offsets, draws[np.arange(max_size)[None, :] < sizes[:, None]]
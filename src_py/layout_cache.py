@@ -0,0 +1,130 @@
+"""Content-addressed on-disk cache of generated warehouse layouts.
+
+Entries are keyed by the warehouse type, the layout constants of test_warehouse_generator,
+the seed and GENERATOR_VERSION, so any change of the generator invalidates them. A layout
+entry holds the WarehouseGraph arrays including the item assignment, distance entries hold
+the all-pairs distance matrix. The least recently used entries are evicted once the cache
+outgrows max_bytes.
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+import distance_matrix as dm
+import test_warehouse_generator as twg
+from warehouse_graph import WarehouseGraph
+
+# Increase whenever the generated layouts change for the same parameters and seed.
+GENERATOR_VERSION = 1
+
+
+def layout_key(wh_type, seed):
+    """ Computes the cache key of a layout.
+
+    :param wh_type: The warehouse type.
+    :param seed: Seed of twg.layout_generator.
+    :return: Hex digest.
+    """
+    if seed is None:
+        raise ValueError("Cached layouts need an explicit seed.")
+    parameters = {
+        "wh_type": wh_type,
+        "aisles": twg.AISLES[wh_type],
+        "storage_columns": twg.STORAGE_COLUMNS[wh_type],
+        "items_in_block": twg.ITEMS_IN_BLOCK[wh_type],
+        "cross_aisles": twg.CROSS_AISLES[wh_type],
+        "height": twg.HEIGHT[wh_type],
+        "pick_speed": twg.PICK_SPEED,
+        "unique_random": twg.UNIQUE_RANDOM,
+        "seed": seed,
+        "version": GENERATOR_VERSION,
+    }
+    return hashlib.sha256(json.dumps(parameters, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class LayoutCache:
+    """Cache directory of layouts and distance matrices with LRU size eviction."""
+
+    def __init__(self, root, max_bytes=4 * 1024**3):
+        """ Opens the cache, the directory is created if missing.
+
+        :param root: Cache directory.
+        :param max_bytes: Maximal total size of the cached files.
+        """
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+    def get_layout(self, wh_type, seed):
+        """ Loads the layout from the cache, generating and storing it on a miss.
+
+        :param wh_type: The warehouse type.
+        :param seed: Seed of twg.layout_generator.
+        :return: WarehouseGraph.
+        """
+        path = self.root.joinpath(layout_key(wh_type, seed) + ".npz")
+        if self._hit(path):
+            try:
+                with np.load(path) as arrays:
+                    return WarehouseGraph(**arrays)
+            except FileNotFoundError:
+                # Evicted by another process in the meantime, treated as a miss.
+                pass
+        graph = twg.build_warehouse(wh_type, twg.layout_generator(wh_type, seed))
+        self._store(path, lambda file: np.savez(file, **graph.arrays()))
+        return graph
+
+    def get_distances(self, wh_type, seed):
+        """ Loads the all-pairs distance matrix of the layout, computing and storing it on a miss.
+
+        :param wh_type: The warehouse type.
+        :param seed: Seed of twg.layout_generator.
+        :return: int32 matrix, memory-mapped when loaded from the cache.
+        """
+        path = self.root.joinpath(layout_key(wh_type, seed) + "_distances.npy")
+        if self._hit(path):
+            try:
+                return np.load(path, mmap_mode="r")
+            except FileNotFoundError:
+                # Evicted by another process in the meantime, treated as a miss.
+                pass
+        distances = dm.distance_matrix(self.get_layout(wh_type, seed))
+        self._store(path, lambda file: np.save(file, distances))
+        return distances
+
+    def _hit(self, path):
+        # The modification time serves as the last access time for the eviction.
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def _store(self, path, write):
+        temp_path = path.with_name(path.name + "." + str(os.getpid()) + ".tmp")
+        with open(temp_path, "wb") as file:
+            write(file)
+        os.replace(temp_path, path)
+        self.evict()
+
+    def evict(self):
+        """ Removes the least recently used entries until the cache fits into max_bytes. """
+        entries = []
+        for entry in self.root.iterdir():
+            if entry.suffix not in (".npz", ".npy"):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                # Removed by another process sharing the cache.
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry))
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries, key=lambda entry: entry[0]):
+            if total <= self.max_bytes:
+                break
+            entry.unlink(missing_ok=True)
+            total -= size
@@ -0,0 +1,204 @@
+"""Spatial index over the coordinates of the parsed locations.
+
+Locations with coordinates are bucketed into a uniform grid of square cells over x and y,
+stored in CSR form: the locations of cell c are rows[cell_offsets[c]:cell_offsets[c+1]].
+Distances are Euclidean over x, y and z, z only adds to the distance, so the grid cells
+bound the search. All queries are batched, a query never loops over the locations in
+Python.
+
+Joined with an inventory balance, the index also holds the stocked locations of every item
+in the same CSR form, see nearest_stocked.
+"""
+import numpy as np
+
+from data_tables import lookup
+
+
+def _concat_ranges(starts, counts):
+    """ Returns the owner and the position of every element of the concatenated ranges. """
+    owners = np.repeat(np.arange(len(counts)), counts)
+    positions = np.arange(counts.sum()) + np.repeat(starts - np.cumsum(counts) + counts, counts)
+    return owners, positions
+
+
+def _store_nearest(queries, rows, distances, best_rows, best):
+    """ Stores the nearest row of every query of the candidates, queries must be sorted. """
+    if not len(queries):
+        return
+    starts = np.flatnonzero(np.diff(queries, prepend=-1))
+    minima = np.minimum.reduceat(distances, starts)
+    hits = np.flatnonzero(distances == np.repeat(minima, np.diff(np.append(starts, len(queries)))))
+    first = hits[np.diff(queries[hits], prepend=-1) != 0]
+    best_rows[queries[first]], best[queries[first]] = rows[first], distances[first]
+
+
+class LocationIndex:
+    """Grid buckets of the locations with coordinates, optionally with their stock."""
+
+    def __init__(self, coordinates, rows, cell_size, cell_offsets, grid_shape, origin,
+                 item_ids=None, item_offsets=None, item_rows=None):
+        # int64 (locations, 3) coordinates of every row of the LocationsTable.
+        self.coordinates = coordinates
+        # LocationsTable rows with coordinates, sorted by their cell.
+        self.rows = rows
+        self.cell_size = cell_size
+        self.cell_offsets = cell_offsets
+        self.grid_shape = grid_shape
+        self.origin = origin
+        # Sorted ids of the stocked items, the stocked rows of item i are item_rows[item_offsets[i]:item_offsets[i+1]].
+        self.item_ids = item_ids
+        self.item_offsets = item_offsets
+        self.item_rows = item_rows
+
+    @classmethod
+    def build(cls, locations, balance=None, cell_size=None):
+        """ Builds the index of the locations.
+
+        :param locations: LocationsTable with coordinates.
+        :param balance: InventoryTable of a single day, e.g. InventoryTable.by_date, no stock if None.
+        :param cell_size: Side of a grid cell in coordinate units, about 4 locations per cell if None.
+        :return: LocationIndex.
+        """
+        coordinates = np.stack([locations.columns[axis].astype(np.int64) for axis in ("x", "y", "z")], axis=1)
+        valid = np.flatnonzero(coordinates[:, 0] >= 0)
+        if not len(valid):
+            raise ValueError("No location has coordinates.")
+        origin = coordinates[valid, :2].min(axis=0)
+        extent = coordinates[valid, :2].max(axis=0) - origin + 1
+        if cell_size is None:
+            cell_size = max(1, int(np.ceil(np.sqrt(4 * extent.prod() / len(valid)))))
+        grid_shape = tuple(int(size) for size in (extent + cell_size - 1) // cell_size)
+
+        cells = cls._cell_ids((coordinates[valid, :2] - origin) // cell_size, grid_shape)
+        order = np.argsort(cells, kind="stable")
+        cell_offsets = np.zeros(grid_shape[0] * grid_shape[1] + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cells, minlength=grid_shape[0] * grid_shape[1]), out=cell_offsets[1:])
+        index = cls(coordinates, valid[order], cell_size, cell_offsets, grid_shape, origin)
+
+        if balance is not None:
+            index._join_balance(locations, balance)
+        return index
+
+    @staticmethod
+    def _cell_ids(cells, grid_shape):
+        return cells[:, 0] * grid_shape[1] + cells[:, 1]
+
+    def _join_balance(self, locations, balance):
+        rows = locations.rows_of(balance.location_id.categories)[balance.location_id.codes]
+        stocked = (balance.available_qty > 0) & (rows >= 0)
+        stocked[stocked] = self.coordinates[rows[stocked], 0] >= 0
+        # Unique (item, row) pairs, sorted by item.
+        pairs = np.unique(np.stack((balance.item_id.codes[stocked].astype(np.int64), rows[stocked]), axis=1), axis=0)
+        item_codes, present = np.unique(pairs[:, 0], return_inverse=True)
+        self.item_ids = balance.item_id.categories[item_codes]
+        self.item_offsets = np.zeros(len(item_codes) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(present, minlength=len(item_codes)), out=self.item_offsets[1:])
+        self.item_rows = pairs[:, 1]
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _distances(self, points, owners, rows):
+        return np.sqrt(((self.coordinates[rows] - points[owners]) ** 2).sum(axis=1))
+
+    def _candidates(self, low, high):
+        """ Returns (query, row) pairs of the locations in the cell rectangles [low, high] of the queries. """
+        low = low.clip(0, np.array(self.grid_shape) - 1)
+        high = high.clip(0, np.array(self.grid_shape) - 1)
+        widths = (high - low + 1).clip(min=0)
+        queries, local = _concat_ranges(np.zeros(len(low), dtype=np.int64), widths[:, 0] * widths[:, 1])
+        cells = low[queries] + np.stack(np.divmod(local, widths[queries, 1]), axis=1)
+        cells = self._cell_ids(cells, self.grid_shape)
+        starts = self.cell_offsets[cells]
+        owners, positions = _concat_ranges(starts, self.cell_offsets[cells + 1] - starts)
+        return queries[owners], self.rows[positions]
+
+    def _cells_of(self, points):
+        return (points[:, :2] - self.origin) // self.cell_size
+
+    def within(self, points, radius):
+        """ Finds the locations within the radius of every point.
+
+        :param points: (queries, 3) array of x, y, z.
+        :param radius: Distance in coordinate units.
+        :return: Tuple: (int64 offsets, LocationsTable rows), the locations of query i are
+            rows[offsets[i]:offsets[i+1]], sorted by their distance.
+        """
+        points = np.atleast_2d(np.asarray(points, dtype=np.int64))
+        cells = self._cells_of(points)
+        reach = int(np.ceil(radius / self.cell_size))
+        queries, rows = self._candidates(cells - reach, cells + reach)
+        distances = ((self.coordinates[rows] - points[queries]) ** 2).sum(axis=1)
+        inside = distances <= radius * radius
+        queries, rows, distances = queries[inside], rows[inside], distances[inside]
+        order = np.lexsort((distances, queries))
+        offsets = np.zeros(len(points) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(queries, minlength=len(points)), out=offsets[1:])
+        return offsets, rows[order]
+
+    def in_box(self, low, high):
+        """ Finds the locations inside axis-aligned boxes, e.g. aisle segments.
+
+        :param low: (queries, 3) array of the lowest x, y, z of every box, inclusive.
+        :param high: (queries, 3) array of the highest x, y, z of every box, inclusive.
+        :return: Tuple: (int64 offsets, LocationsTable rows), the locations of query i are
+            rows[offsets[i]:offsets[i+1]], sorted by row.
+        """
+        low = np.atleast_2d(np.asarray(low, dtype=np.int64))
+        high = np.atleast_2d(np.asarray(high, dtype=np.int64))
+        queries, rows = self._candidates(self._cells_of(low), self._cells_of(high))
+        coordinates = self.coordinates[rows]
+        inside = ((coordinates >= low[queries]) & (coordinates <= high[queries])).all(axis=1)
+        queries, rows = queries[inside], rows[inside]
+        order = np.lexsort((rows, queries))
+        offsets = np.zeros(len(low) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(queries, minlength=len(low)), out=offsets[1:])
+        return offsets, rows[order]
+
+    def nearest(self, points):
+        """ Finds the nearest location of every point.
+
+        The cell rectangle around the unresolved points doubles until it holds a location
+        closer than any location outside it.
+
+        :param points: (queries, 3) array of x, y, z.
+        :return: Tuple: (LocationsTable rows, float64 distances).
+        """
+        points = np.atleast_2d(np.asarray(points, dtype=np.int64))
+        cells = self._cells_of(points)
+        best_rows = np.full(len(points), -1, dtype=np.int64)
+        best = np.full(len(points), np.inf)
+        pending = np.arange(len(points))
+        reach = 1
+        while len(pending):
+            queries, rows = self._candidates(cells[pending] - reach, cells[pending] + reach)
+            queries = pending[queries]
+            _store_nearest(queries, rows, self._distances(points, queries, rows), best_rows, best)
+            # Locations outside the rectangle are farther than reach cells in x or y.
+            covers = (cells[pending] - reach <= 0).all(axis=1) & \
+                (cells[pending] + reach >= np.array(self.grid_shape) - 1).all(axis=1)
+            pending = pending[(best[pending] > reach * self.cell_size) & ~covers]
+            reach *= 2
+        return best_rows, best
+
+    def nearest_stocked(self, item_ids, points):
+        """ Finds the nearest location holding each item, requires the balance.
+
+        :param item_ids: Sequence of item ids.
+        :param points: (queries, 3) array of x, y, z, or a single point for all queries.
+        :return: Tuple: (LocationsTable rows, float64 distances), -1 and inf for unknown items and
+            items out of stock.
+        """
+        if self.item_ids is None:
+            raise ValueError("The index is built without an inventory balance.")
+        codes = lookup(self.item_ids, np.asarray(item_ids, dtype=str))
+        points = np.broadcast_to(np.asarray(points, dtype=np.int64), (len(codes), 3))
+        starts = self.item_offsets[codes.clip(min=0)]
+        counts = np.where(codes >= 0, self.item_offsets[codes.clip(min=0) + 1] - starts, 0)
+        queries, positions = _concat_ranges(starts, counts)
+        rows = self.item_rows[positions]
+
+        best_rows = np.full(len(codes), -1, dtype=np.int64)
+        best = np.full(len(codes), np.inf)
+        _store_nearest(queries, rows, self._distances(points, queries, rows), best_rows, best)
+        return best_rows, best
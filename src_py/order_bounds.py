@@ -0,0 +1,98 @@
+"""Per-order lower bounds of the picking tour length.
+
+All distances are hop counts from a single batched BFS, whose rows start from the source
+vertex of each agent and from all locations of each item class at once, see
+distance_matrix.group_distances. For an order of an
+agent starting and ending at vertex s:
+
+- radius is the largest distance from s to the nearest location of a class, the tour is
+  at least 2 * radius long,
+- mst is the weight of the minimum spanning tree over s and the classes, where two
+  classes are as far as their two nearest locations; removing an edge of the tour leaves
+  a spanning path of the classes, so the tour is at least mst long.
+"""
+from dataclasses import dataclass
+from typing import List
+
+import numpy as np
+
+import distance_matrix as dm
+
+
+@dataclass
+class OrderBounds:
+    """Lower bounds and difficulty measures of an order."""
+
+    # Number of locations of each item class.
+    locations: List[int]
+    # Location vertex nearest to the source of each item class.
+    nearest: List[int]
+    radius: int
+    mst: int
+
+    @property
+    def bound(self):
+        return max(2 * self.radius, self.mst)
+
+    def __str__(self):
+        return "Locations " + ",".join(map(str, self.locations)) + " Nearest " + ",".join(map(str, self.nearest)) + \
+            " Radius " + str(self.radius) + " MST " + str(self.mst) + " Bound " + str(self.bound)
+
+
+def mst_weight(matrix):
+    """ Computes the weight of the minimum spanning tree of a complete graph by Prim's algorithm.
+
+    :param matrix: Symmetric matrix of the edge weights.
+    :return: Weight of the tree.
+    """
+    in_tree = np.zeros(len(matrix), dtype=bool)
+    in_tree[0] = True
+    best = matrix[0].astype(np.int64)
+    total = 0
+    for _ in range(len(matrix) - 1):
+        vertex = int(np.argmin(np.where(in_tree, np.iinfo(np.int64).max, best)))
+        total += int(best[vertex])
+        in_tree[vertex] = True
+        best = np.minimum(best, matrix[vertex])
+    return total
+
+
+def compute_bounds(graph, agents_orders, first_agent=0, neighbors=None):
+    """ Computes the bounds of every order, agent i starts and ends at vertex 2*i.
+
+    :param graph: WarehouseGraph or networkx graph.
+    :param agents_orders: List of orders of each agent, see test_warehouse_generator.generate_orders.
+    :param first_agent: Index of the first agent.
+    :param neighbors: Precomputed neighbor table of the graph, computed if None.
+    :return: List of lists of OrderBounds, in the shape of agents_orders.
+    """
+    # One multi-source BFS row per source and per item class.
+    groups = [np.array([2 * i]) for i in range(first_agent, first_agent + len(agents_orders))]
+    for orders in agents_orders:
+        for order in orders:
+            groups += [np.array([item[0] for item in item_class]) for item_class in order]
+    distances = dm.group_distances(graph, groups, neighbors=neighbors)
+
+    bounds = []
+    row = len(agents_orders)
+    for i, orders in enumerate(agents_orders, first_agent):
+        bounds.append([])
+        for order in orders:
+            counts = [len(item_class) for item_class in order]
+            class_rows = np.arange(row, row + len(order))
+            row += len(order)
+            order_vertices = np.concatenate(groups[class_rows[0]:row]) if len(order) else np.zeros(0, np.int64)
+            starts = np.cumsum([0] + counts)[:-1]
+
+            # Distances between the groups: the source and the classes.
+            source = 2 * i
+            matrix = np.zeros((len(order) + 1, len(order) + 1), dtype=np.int64)
+            matrix[0, 1:] = matrix[1:, 0] = distances[class_rows, source]
+            if len(order):
+                matrix[1:, 1:] = np.minimum.reduceat(distances[class_rows][:, order_vertices], starts, axis=1)
+
+            from_source = distances[i - first_agent, order_vertices]
+            order_by = np.lexsort((from_source, np.repeat(np.arange(len(order)), counts)))
+            nearest = order_vertices[order_by[starts]]
+            bounds[-1].append(OrderBounds(counts, nearest.tolist(), int(matrix[0].max()), mst_weight(matrix)))
+    return bounds
@@ -0,0 +1,110 @@
+"""Replay of the order history as time-windowed batches of pick tasks.
+
+Orders are grouped into windows of their ship date and, within a window, by picker. Each
+item of an order is located through the inventory balance of the window's first day: the
+location holding the largest available quantity of the item is picked, and its
+coordinates come from the LocationsTable. Batches are produced lazily, one window at a
+time.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+from data_tables import lookup
+
+
+@dataclass
+class PickBatch:
+    """Pick tasks of a single picker in a time window, one row per order line."""
+
+    picker: str
+    start: np.datetime64
+    end: np.datetime64
+    order_ids: np.ndarray
+    line_nums: np.ndarray
+    item_ids: np.ndarray
+    quantities: np.ndarray
+    location_ids: np.ndarray
+    # int32 (tasks, 3) array of x, y, z, -1 for items without a located stock.
+    coordinates: np.ndarray
+
+    def __len__(self):
+        return len(self.order_ids)
+
+    @property
+    def located(self):
+        return self.coordinates[:, 0] >= 0
+
+
+def stock_locations(store, date):
+    """ Chooses the location of every item on the date.
+
+    :param store: InventoryStore.
+    :param date: Date of the balance.
+    :return: int32 array of store location codes by store item code, -1 for items out of stock.
+    """
+    records = store.snapshot(date)
+    records = records[records["available_qty"] > 0]
+    # The location with the largest available quantity comes first for every item.
+    order = np.lexsort((-records["available_qty"], records["item"]))
+    items = records["item"][order]
+    first = np.ones(len(items), dtype=bool)
+    first[1:] = items[1:] != items[:-1]
+    chosen = np.full(len(store.items), -1, dtype=np.int32)
+    chosen[items[first]] = records["location"][order[first]]
+    return chosen
+
+
+def replay_orders(orders, locations, store, window=1, date_name="s_ship_date"):
+    """ Yields the pick tasks of the orders in batches by time window and picker.
+
+    :param orders: OrdersTable.
+    :param locations: LocationsTable with coordinates.
+    :param store: InventoryStore of the inventory balance.
+    :param window: Length of a time window in days, windows start at the first ship date.
+    :param date_name: Date column of the orders defining the windows.
+    :return: Generator of PickBatch, in the order of windows and pickers.
+    """
+    dates = orders.columns[date_name]
+    rows = np.flatnonzero(~np.isnat(dates))
+    rows = rows[np.argsort(dates[rows], kind="stable")]
+    if not len(rows):
+        return
+    window = np.timedelta64(window, "D")
+    first = dates[rows[0]]
+    windows = (dates[rows] - first) // window
+    bounds = np.flatnonzero(np.diff(windows)) + 1
+
+    # Order items -> store items, store locations -> coordinates.
+    item_codes = lookup(store.items, orders.item_id.categories)
+    store_coordinates = locations.coordinates(locations.rows_of(store.locations))
+
+    for window_rows in np.split(rows, bounds):
+        start = first + ((dates[window_rows[0]] - first) // window) * window
+        chosen = stock_locations(store, start)
+        window_items = item_codes[orders.item_id.codes[window_rows]]
+        location_codes = np.full(len(window_rows), -1, dtype=np.int32)
+        location_codes[window_items >= 0] = chosen[window_items[window_items >= 0]]
+
+        pickers = orders.picker.codes[window_rows]
+        order = np.lexsort((orders.line_num[window_rows], orders.id[window_rows], pickers))
+        picker_bounds = np.flatnonzero(np.diff(pickers[order])) + 1
+        for picker_order in np.split(order, picker_bounds):
+            batch_rows = window_rows[picker_order]
+            batch_locations = location_codes[picker_order]
+            coordinates = np.full((len(batch_rows), 3), -1, dtype=np.int32)
+            located = batch_locations >= 0
+            coordinates[located] = store_coordinates[batch_locations[located]]
+            location_ids = np.full(len(batch_rows), "", dtype=store.locations.dtype)
+            location_ids[located] = store.locations[batch_locations[located]]
+            yield PickBatch(
+                picker=str(orders.picker.categories[pickers[picker_order[0]]]),
+                start=start,
+                end=start + window,
+                order_ids=orders.id[batch_rows],
+                line_nums=orders.line_num[batch_rows],
+                item_ids=orders.item_id.categories[orders.item_id.codes[batch_rows]],
+                quantities=orders.requested_qty[batch_rows],
+                location_ids=location_ids,
+                coordinates=coordinates,
+            )
@@ -0,0 +1,135 @@
+"""Warehouse graphs of real parsed warehouses.
+
+Locations are bucketed by their coordinates into the aisle/cross aisle grid of
+WarehouseGraph.from_layout:
+
+- x is split into aisles of aisle_pitch columns, the first column of an aisle is its left
+  storage column and the others the right one,
+- y is split into rows of row_pitch, rows without any location separate the blocks, i.e.
+  they become cross aisles, shorter blocks are padded to the longest one,
+- z is the height level.
+
+Items of the inventory balance are numbered from 1 in the order of their ids, item 0 marks
+an empty position.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+import test_warehouse_generator as twg
+from data_tables import lookup
+from item_index import ItemIndex
+from order_bounds import compute_bounds
+from warehouse_graph import WarehouseGraph
+
+
+@dataclass
+class RealWarehouse:
+    """WarehouseGraph of a real warehouse with the ids of its items and locations."""
+
+    graph: WarehouseGraph
+    # Id of each item number, item_ids[0] == "" for empty positions.
+    item_ids: np.ndarray
+    # Flat (column, row, level) index into graph.items of each location row, -1 without coordinates.
+    location_positions: np.ndarray
+
+    def item_numbers(self, item_ids):
+        """ Returns the item numbers of the item ids, 0 for the items not stored in the warehouse. """
+        return lookup(self.item_ids, item_ids).clip(min=0)
+
+
+def bucket_locations(locations, aisle_pitch=3, row_pitch=1):
+    """ Assigns the locations to the positions of the grid layout.
+
+    :param locations: LocationsTable with coordinates.
+    :param aisle_pitch: Width of an aisle in x units, including both storage columns.
+    :param row_pitch: Length of a row in y units.
+    :return: Tuple: (aisles, items_in_block, cross_aisles, height, int64 (locations, 4) array of
+        storage column, row, level and a valid flag).
+    """
+    valid = locations.x >= 0
+    x, y, z = (locations.columns[axis][valid].astype(np.int64) for axis in ("x", "y", "z"))
+    if not valid.any():
+        raise ValueError("No location has coordinates.")
+
+    aisle, offset = np.divmod(x - x.min(), aisle_pitch)
+    column = aisle * 2 + (offset > 0)
+
+    # Rows of the locations, a gap between occupied rows separates two blocks.
+    y_rows = (y - y.min()) // row_pitch
+    occupied = np.unique(y_rows)
+    block_of_occupied = np.concatenate(([0], np.cumsum(np.diff(occupied) > 1)))
+    block_starts = np.flatnonzero(np.diff(block_of_occupied, prepend=-1))
+    items_in_block = int(np.diff(np.append(block_starts, len(occupied))).max())
+    idx = np.searchsorted(occupied, y_rows)
+    block = block_of_occupied[idx]
+    row = block * items_in_block + idx - block_starts[block]
+
+    level = z - z.min()
+    positions = np.zeros((len(locations), 4), dtype=np.int64)
+    positions[valid] = np.stack((column, row, level, np.ones_like(level)), axis=1)
+    return int(aisle.max()) + 1, items_in_block, int(block.max()) + 2, int(level.max()) + 1, positions
+
+
+def build_real_warehouse(locations, balance, aisle_pitch=3, row_pitch=1):
+    """ Builds the warehouse graph of the locations and assigns the inventory into it.
+
+    A position holds the item with an available quantity at the location, the last balance
+    record wins if a location or a position holds more items.
+
+    :param locations: LocationsTable with coordinates.
+    :param balance: InventoryTable of a single day, e.g. InventoryTable.by_date.
+    :param aisle_pitch: See bucket_locations.
+    :param row_pitch: See bucket_locations.
+    :return: RealWarehouse.
+    """
+    aisles, items_in_block, cross_aisles, height, positions = bucket_locations(locations, aisle_pitch, row_pitch)
+    items = np.zeros((aisles * 2, items_in_block * (cross_aisles - 1), height, 2))
+    items[..., 1] = np.array(twg.PICK_SPEED)[np.arange(height).clip(max=len(twg.PICK_SPEED) - 1)]
+    position_index = np.where(positions[:, 3] > 0, np.ravel_multi_index(
+        tuple(positions[:, :3].T), items.shape[:3]), -1)
+
+    rows = locations.rows_of(balance.location_id.categories)[balance.location_id.codes]
+    record_positions = np.where(rows >= 0, position_index[rows.clip(min=0)], -1)
+    stored = (record_positions >= 0) & (balance.available_qty > 0)
+    items[..., 0][np.unravel_index(record_positions[stored], items.shape[:3])] = balance.item_id.codes[stored] + 1
+
+    item_ids = np.concatenate(([""], balance.item_id.categories))
+    graph = WarehouseGraph.from_layout(aisles, items_in_block, cross_aisles, items)
+    return RealWarehouse(graph, item_ids, position_index)
+
+
+def batch_orders(batch, warehouse, item_index=None):
+    """ Converts a PickBatch of order_replay into orders of the whole_instance.txt format.
+
+    Order lines of items not stored in the warehouse are left out, as well as empty orders.
+
+    :param batch: PickBatch.
+    :param warehouse: RealWarehouse.
+    :param item_index: ItemIndex of the warehouse graph, built if None.
+    :return: List of orders, see test_warehouse_generator.generate_orders.
+    """
+    if item_index is None:
+        item_index = ItemIndex.from_warehouse(warehouse.graph)
+    numbers = warehouse.item_numbers(batch.item_ids)
+    orders = []
+    for order_id in np.unique(batch.order_ids):
+        order_numbers = numbers[batch.order_ids == order_id]
+        # Number 0 are the empty positions, i.e. items not stored in the warehouse.
+        order = [item_index.positions(number) for number in order_numbers[order_numbers > 0].tolist()]
+        order = [positions for positions in order if positions]
+        if order:
+            orders.append(order)
+    return orders
+
+
+def serialize_real_instance(warehouse, agents_orders, file_path, name="real"):
+    """ Writes the warehouse and the orders of the agents in the whole_instance.txt format.
+
+    :param warehouse: RealWarehouse.
+    :param agents_orders: List of orders of each agent, see batch_orders.
+    :param file_path: Path to the output file.
+    :param name: Name of the instance in the header line.
+    """
+    twg.serialize_instance(warehouse.graph, name, agents_orders, file_path,
+                           compute_bounds(warehouse.graph, agents_orders))
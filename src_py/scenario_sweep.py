@@ -0,0 +1,140 @@
+"""Batch generation of benchmark instances over a grid of scenarios.
+
+Scenarios are generated in parallel by a process pool. Each scenario draws from its own
+np.random.Generator stream derived from its seed, so the output does not depend on the
+number of workers or on the order in which the scenarios finish.
+
+Usage:
+    python scenario_sweep.py --wh-types 0 1 --agents 1 5 10 --orders 1 2 --seeds 0 1 2 --out-dir ../data/sweep
+"""
+import argparse
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import numpy as np
+
+import test_warehouse_generator as twg
+from instance_sets import InstanceSet
+from layout_cache import LayoutCache
+from order_bounds import compute_bounds
+
+
+@dataclass(frozen=True)
+class Scenario:
+    """Parameters of a single generated instance."""
+
+    wh_type: int
+    agents: int
+    orders_per_agent: int
+    seed: int
+
+    def file_name(self):
+        return f"instance_t{self.wh_type}_a{self.agents}_o{self.orders_per_agent}_s{self.seed}.txt"
+
+    def layout_name(self):
+        """ Directory of the InstanceSet shared by the scenarios of the same layout. """
+        return f"layout_t{self.wh_type}_s{self.seed}"
+
+    def orders_name(self):
+        return f"a{self.agents}_o{self.orders_per_agent}"
+
+    def layout_rng(self):
+        """ Generator of the item assignment, it depends on the warehouse type and seed only. """
+        return twg.layout_generator(self.wh_type, self.seed)
+
+    def orders_rng(self):
+        """ Generator of the orders, independent of the layout stream. """
+        return np.random.default_rng(np.random.SeedSequence(
+            self.seed, spawn_key=(self.wh_type, self.agents, self.orders_per_agent)))
+
+
+def scenario_grid(wh_types, agents, orders_per_agent, seeds):
+    """ Lists all the combinations of the parameters.
+
+    :return: List of Scenario.
+    """
+    return [Scenario(*values) for values in itertools.product(wh_types, agents, orders_per_agent, seeds)]
+
+
+def generate_scenario(scenario, out_dir, cache_dir=None, split=False):
+    """ Generates and serializes a single scenario.
+
+    :param scenario: Scenario.
+    :param out_dir: Output directory.
+    :param cache_dir: Directory of the LayoutCache, layouts are always regenerated if None.
+    :param split: Write the orders into the InstanceSet of the layout, the layout is written
+                  only once for all the scenarios sharing it.
+    :return: Manifest record of the generated file.
+    """
+    start = time.perf_counter()
+    if cache_dir is not None:
+        graph = LayoutCache(cache_dir).get_layout(scenario.wh_type, scenario.seed)
+    else:
+        graph = twg.build_warehouse(scenario.wh_type, scenario.layout_rng())
+    orders = twg.generate_orders(graph, scenario.agents * scenario.orders_per_agent, rng=scenario.orders_rng())
+    agents_orders = [orders[i*scenario.orders_per_agent:(i+1)*scenario.orders_per_agent]
+                     for i in range(scenario.agents)]
+    bounds = compute_bounds(graph, agents_orders)
+    record = asdict(scenario)
+    if split:
+        instance_set = InstanceSet(Path(out_dir).joinpath(scenario.layout_name()))
+        if not instance_set.has_layout():
+            instance_set.write_layout(graph, scenario.wh_type)
+        instance_set.write_orders(scenario.orders_name(), agents_orders, bounds)
+        file_path = instance_set.orders_path(scenario.orders_name())
+        record["layout"] = str(instance_set.layout_path.relative_to(out_dir))
+    else:
+        file_path = Path(out_dir).joinpath(scenario.file_name())
+        twg.serialize_instance(graph, scenario.wh_type, agents_orders, file_path, bounds)
+
+    record["file"] = str(Path(file_path).relative_to(out_dir))
+    record["bytes"] = os.path.getsize(file_path)
+    record["seconds"] = time.perf_counter() - start
+    return record
+
+
+def run_sweep(scenarios, out_dir, workers=None, cache_dir=None, split=False):
+    """ Generates all the scenarios in a process pool and writes manifest.json into out_dir.
+
+    :param scenarios: Iterable of Scenario.
+    :param out_dir: Output directory, created if missing.
+    :param workers: Number of worker processes, os.cpu_count() if None.
+    :param cache_dir: Directory of the LayoutCache shared by the workers.
+    :param split: Write split instances, see generate_scenario.
+    :return: List of manifest records in the order of the scenarios.
+    """
+    scenarios = list(scenarios)
+    Path(out_dir).mkdir(parents=True, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        records = list(executor.map(generate_scenario, scenarios, itertools.repeat(out_dir),
+                                    itertools.repeat(cache_dir), itertools.repeat(split)))
+
+    with open(Path(out_dir).joinpath("manifest.json"), "w") as file:
+        json.dump({"scenarios": records}, file, indent=2)
+    return records
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate warehouse instances over a grid of scenarios.")
+    parser.add_argument("--wh-types", type=int, nargs="+", default=[0])
+    parser.add_argument("--agents", type=int, nargs="+", default=[1])
+    parser.add_argument("--orders", type=int, nargs="+", default=[1], help="orders per agent")
+    parser.add_argument("--seeds", type=int, nargs="+", default=[0])
+    parser.add_argument("--out-dir", default="../data/sweep")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--cache-dir", default=None, help="layout cache directory")
+    parser.add_argument("--split", action="store_true", help="write the layouts once and the orders separately")
+    args = parser.parse_args(argv)
+
+    scenarios = scenario_grid(args.wh_types, args.agents, args.orders, args.seeds)
+    records = run_sweep(scenarios, args.out_dir, args.workers, args.cache_dir, args.split)
+    print(f"Generated {len(records)} instances into {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
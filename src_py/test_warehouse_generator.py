@@ -8,6 +8,11 @@ import numpy as np
 import networkx as nx
 import matplotlib.pyplot as plt
 
+import instrumentation
+from item_index import ItemIndex
+from order_bounds import compute_bounds
+from warehouse_graph import SHELF, TYPE_NAMES, WarehouseGraph
+
 # General parameters
 WALK_SPEED = 100         # cm/sec
 # 1 edge per time unit
@@ -40,8 +45,6 @@ CLASS_C_UNIQUE = 0.90
 
 UNIQUE_RANDOM = 0.075
 
-random.seed(123)
-
 
 # As a function for future extension.
 def calculate_pick_speed(height: int):
@@ -62,168 +65,179 @@ def calculate_distance(wh_type: int, column: int, row: int, height: int):
     return ((column // 2) * AISLE_DIST + row * PICK_LOC_DIST) / WALK_SPEED + calculate_pick_speed(height)
 
 
-def generate_and_assign_items_random(wh_type):
+def _generator(rng):
+    """ Returns rng, or a np.random.Generator seeded from the random module state if None. """
+    if rng is None:
+        rng = np.random.default_rng(random.getrandbits(64))
+    return rng
+
+
+def layout_generator(wh_type, seed):
+    """ Returns the np.random.Generator of the item assignment of the given warehouse type and seed. """
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(wh_type,)))
+
+
+def generate_and_assign_items_random(wh_type, rng=None):
+    """ Generates items and assigns them into random storage locations.
+
+    Each unique item is placed at least once, using a random permutation of the positions. The rest of the
+    positions is filled with random items, redrawing the items repeated within a (column, row) stack.
+
+    :param wh_type: 0,1,2 - small, med, large
+    :param rng: np.random.Generator, derived from the random module state if None.
+    :return: Array of shape (columns, rows, height, 2) - item id and pick time of each position.
+    """
+    rng = _generator(rng)
     wh_capacity = PRODUCT_CAPACITY[wh_type]
     unique_items = int(UNIQUE_RANDOM * wh_capacity)
-    items = np.zeros((STORAGE_COLUMNS[wh_type], ITEMS_IN_AISLE[wh_type], HEIGHT[wh_type], 2))
+    height = HEIGHT[wh_type]
+    items = np.zeros((STORAGE_COLUMNS[wh_type], ITEMS_IN_AISLE[wh_type], height, 2))
 
     # Generate each unique item into some position
-    for i in range(1, unique_items+1):
-        while True:
-            j = random.randint(0, STORAGE_COLUMNS[wh_type]-1)
-            k = random.randint(0, ITEMS_IN_AISLE[wh_type]-1)
-            l = random.randint(0, HEIGHT[wh_type]-1)
-            if items[j, k, l, 0] == 0:
-                items[j, k, l, 0] = i
-                items[j, k, l, 1] = PICK_SPEED[l]
-                break
+    stacks = np.zeros(STORAGE_COLUMNS[wh_type] * ITEMS_IN_AISLE[wh_type] * height, dtype=np.int64)
+    stacks[rng.permutation(stacks.size)[:unique_items]] = np.arange(1, unique_items+1)
+    stacks = stacks.reshape(-1, height)
 
     # Fill in the rest of free positions with random items
-    for i in range(STORAGE_COLUMNS[wh_type]):
-        for j in range(ITEMS_IN_AISLE[wh_type]):
-            used = set()
-            for k in range(HEIGHT[wh_type]):
-                if items[i, j, k, 0] != 0:
-                    used.add(items[i, j, k, 0])
-            for k in range(HEIGHT[wh_type]):
-                if items[i, j, k, 0] != 0:
-                    continue
-                while True:
-                    item = random.randint(1, unique_items)
-                    if item not in used:
-                        used.add(item)
-                        items[i, j, k, 0] = item
-                        items[i, j, k, 1] = PICK_SPEED[k]
-                        break
+    free = stacks == 0
+    stacks[free] = rng.integers(1, unique_items+1, size=np.count_nonzero(free))
+    # A free position is redrawn if its item is at a fixed or lower position of the same stack as well.
+    lower = np.arange(height)[:, None] < np.arange(height)[None, :]
+    while True:
+        same = stacks[:, :, None] == stacks[:, None, :]
+        repeated = free & (same & (lower | ~free[:, :, None])).any(axis=1)
+        if not repeated.any():
+            break
+        stacks[repeated] = rng.integers(1, unique_items+1, size=np.count_nonzero(repeated))
+
+    items[..., 0] = stacks.reshape(items.shape[:3])
+    items[..., 1] = np.array(PICK_SPEED[:height])
     return items
 
 
-def generate_items(warehouse_type: int):
+def generate_items(warehouse_type: int, rng=None):
     """ Generates items using the ABC storage method for further processing.
 
+    Each unique item of a class is generated once, the rest of the class capacity is sampled
+    from the A, B and C item ranges in a single batch - 60/30/10 for the A and B classes and
+    10/30/60 for the C class.
+
     :param warehouse_type:
-    :return: Tuple: (a_class,b_class,c_class) items.
+    :param rng: np.random.Generator, derived from the random module state if None.
+    :return: Array of the shuffled A class items followed by the B and C class items.
     """
-    type_a_unique = int(np.round(CLASS_A_CAPACITY[warehouse_type] * CLASS_A_UNIQUE))
-    type_b_unique = int(np.round(CLASS_B_CAPACITY[warehouse_type] * CLASS_B_UNIQUE))
-    type_c_unique = int(np.round(CLASS_C_CAPACITY[warehouse_type] * CLASS_C_UNIQUE))
-
-    a_class_unique = []
-    b_class_unique = []
-    c_class_unique = []
-    a_class = []
-    b_class = []
-    c_class = []
-
-    type_a_range = (0, type_a_unique)
-    type_b_range = (type_a_range[1]+1, type_a_range[1] + type_b_unique)
-    type_c_range = (type_b_range[1]+1, type_b_range[1] + type_c_unique)
-
-    # Generate one of each item type
-    for i in range(type_c_range[1]):
-        if i < type_a_range[1]:
-            a_class_unique.append(i)
-            a_class.append(i)
-        elif i < type_b_range[1]:
-            b_class_unique.append(i)
-            b_class.append(i)
-        else:
-            c_class_unique.append(i)
-            c_class.append(i)
-
-    # Generate the rest of the items - 60,30,10 distribution
-    for i in range(type_a_unique, CLASS_A_CAPACITY[warehouse_type]):
-        roll = random.random()
-        if roll < 0.6:
-            a_class.append(random.randint(type_a_range[0], type_a_range[1]))
-        elif roll < 0.9:
-            a_class.append(random.randint(type_b_range[0], type_b_range[1]))
-        else:
-            a_class.append(random.randint(type_c_range[0], type_c_range[1]))
-
-    for i in range(type_b_unique, CLASS_B_CAPACITY[warehouse_type]):
-        roll = random.random()
-        if roll < 0.6:
-            b_class.append(random.randint(type_a_range[0], type_a_range[1]))
-        elif roll < 0.9:
-            b_class.append(random.randint(type_b_range[0], type_b_range[1]))
-        else:
-            b_class.append(random.randint(type_c_range[0], type_c_range[1]))
-
-    for i in range(type_c_unique, CLASS_C_CAPACITY[warehouse_type]):
-        roll = random.random()
-        if roll < 0.1:
-            c_class.append(random.randint(type_a_range[0], type_a_range[1]))
-        elif roll < 0.4:
-            c_class.append(random.randint(type_b_range[0], type_b_range[1]))
-        else:
-            c_class.append(random.randint(type_c_range[0], type_c_range[1]))
-
-    return random.sample(a_class, k=len(a_class)) + \
-           random.sample(b_class, k=len(b_class)) + \
-           random.sample(c_class, k=len(c_class))
+    rng = _generator(rng)
+    capacities = np.array([CLASS_A_CAPACITY[warehouse_type], CLASS_B_CAPACITY[warehouse_type],
+                           CLASS_C_CAPACITY[warehouse_type]])
+    unique = np.round(capacities * np.array([CLASS_A_UNIQUE, CLASS_B_UNIQUE, CLASS_C_UNIQUE])).astype(np.int64)
+
+    # Inclusive item ranges of the classes.
+    ends = np.cumsum(unique)
+    lows = np.array([0, ends[0] + 1, ends[1] + 1])
+    highs = ends
+    mixes = (np.array([0.6, 0.3, 0.1]), np.array([0.6, 0.3, 0.1]), np.array([0.1, 0.3, 0.6]))
+
+    classes = []
+    for item_class in range(3):
+        # Unique items of the class, the classes split [0, ends[2]) by the unique counts.
+        start = 0 if item_class == 0 else ends[item_class - 1]
+        drawn = rng.choice(3, size=capacities[item_class] - unique[item_class], p=mixes[item_class])
+        rest = rng.integers(lows[drawn], highs[drawn] + 1)
+        classes.append(rng.permutation(np.concatenate((np.arange(start, ends[item_class]), rest))))
+    return np.concatenate(classes)
 
 
 # Assuming grid layout.
-def assign_items_into_storage(wh_type):
-    dimensions = (STORAGE_COLUMNS[wh_type], ITEMS_IN_AISLE[wh_type], HEIGHT[wh_type])
-    shelves = np.zeros(dimensions)
-    distances = np.zeros(dimensions)
-    dist_list = []
-
-    # Calculate and sort distances for division into zones.
-    for column in range(STORAGE_COLUMNS[wh_type]):
-        for row in range(ITEMS_IN_AISLE[wh_type]):
-            for height in range(HEIGHT[wh_type]):
-                dist = calculate_distance(0, column, row, height)
-                distances[column, row, height] = dist
-                dist_list.append(dist)
-    dist_list.sort()
-    ab_divider = dist_list[int(np.round(PRODUCT_CAPACITY[wh_type] * 0.75))]    # 25% of items, 75% of demand
-    bc_divider = dist_list[int(np.round(PRODUCT_CAPACITY[wh_type] * 0.90))]    # 50% of items  90% of demand
-    random_items = generate_items(wh_type)
-
-    front_index = 0
-    end_index = len(random_items) - 1
-    left_out_indices = []
+def storage_distances(wh_type):
+    """ Computes calculate_distance of every storage position at once.
+
+    :param wh_type: 0,1,2 - small, med, large
+    :return: Array of shape (columns, rows, height) of times in sec.
+    """
+    column = np.arange(STORAGE_COLUMNS[wh_type])[:, None, None]
+    row = np.arange(ITEMS_IN_AISLE[wh_type])[None, :, None]
+    pick_speed = np.array(PICK_SPEED[:HEIGHT[wh_type]])[None, None, :]
+    return ((column // 2) * AISLE_DIST + row * PICK_LOC_DIST) / WALK_SPEED + pick_speed
+
+
+def assign_items_into_storage(wh_type, rng=None):
+    """ Assigns the ABC items into storage by the distance of the positions.
+
+    Positions in the nearest 75 % get the A class end of the items, positions beyond 90 %
+    the C class end, the positions in between are filled last, everything in position order.
+
+    :param wh_type: 0,1,2 - small, med, large
+    :param rng: np.random.Generator used by generate_items.
+    :return: Array of shape (columns, rows, height) of item ids.
+    """
+    distances = storage_distances(wh_type).ravel()
+    ab_index = int(np.round(PRODUCT_CAPACITY[wh_type] * 0.75))    # 25% of items, 75% of demand
+    bc_index = int(np.round(PRODUCT_CAPACITY[wh_type] * 0.90))    # 50% of items  90% of demand
+    partitioned = np.partition(distances, (ab_index, bc_index))
+    ab_divider, bc_divider = partitioned[ab_index], partitioned[bc_index]
+    random_items = generate_items(wh_type, rng)
 
     # TODO: Fix - same item multiple times at the same location
-    for column in range(STORAGE_COLUMNS[wh_type]):
-        for row in range(ITEMS_IN_AISLE[wh_type]):
-            for height in range(HEIGHT[wh_type]):
-                if distances[column, row, height] <= ab_divider:
-                    shelves[column, row, height] = random_items[front_index]
-                    front_index += 1
-                elif distances[column, row, height] > bc_divider:
-                    shelves[column, row, height] = random_items[end_index]
-                    end_index -= 1
-                else:
-                    left_out_indices.append((column, row, height))
-
-    for column, row, height in left_out_indices:
-        shelves[column, row, height] = random_items[front_index]
-        front_index += 1
+    front = distances <= ab_divider
+    back = distances > bc_divider
+    middle = ~front & ~back
+    front_count = np.count_nonzero(front)
+    shelves = np.zeros(distances.shape)
+    shelves[front] = random_items[:front_count]
+    shelves[middle] = random_items[front_count:front_count + np.count_nonzero(middle)]
+    shelves[back] = random_items[::-1][:np.count_nonzero(back)]
+    shelves = shelves.reshape(STORAGE_COLUMNS[wh_type], ITEMS_IN_AISLE[wh_type], HEIGHT[wh_type])
 
     verify_distribution(wh_type, shelves)
 
     return shelves
 
 
+def generate_and_assign_items_abc(wh_type, rng=None):
+    """ Generates the ABC items and assigns them into storage, see assign_items_into_storage.
+
+    :param wh_type: 0,1,2 - small, med, large
+    :param rng: np.random.Generator, derived from the random module state if None.
+    :return: Array of shape (columns, rows, height, 2) - item id and pick time of each position.
+    """
+    shelves = assign_items_into_storage(wh_type, rng)
+    items = np.zeros(shelves.shape + (2,))
+    # Item 0 marks an empty position.
+    items[..., 0] = shelves + 1
+    items[..., 1] = np.array(PICK_SPEED[:HEIGHT[wh_type]])
+    return items
+
+
 def verify_distribution(wh_type, shelves):
-    distribution = np.zeros(PRODUCT_CAPACITY[wh_type])
-    for column in range(STORAGE_COLUMNS[wh_type]):
-        for row in range(ITEMS_IN_AISLE[wh_type]):
-            for height in range(HEIGHT[wh_type]):
-                distribution[int(shelves[column, row, height])] += 1
-    print()
+    """ Counts the positions of each item.
+
+    :param wh_type: 0,1,2 - small, med, large
+    :param shelves: Array of item ids, see assign_items_into_storage.
+    :return: Array of the number of positions of each item id.
+    """
+    return np.bincount(shelves.ravel().astype(np.int64), minlength=PRODUCT_CAPACITY[wh_type])
 
 
 # For each item, saves all locations of the item.
 def find_items(graph, max_items):
+    with instrumentation.stage("find_items"):
+        positions = _find_items(graph, max_items)
+    instrumentation.count("item_positions", sum(len(item_positions) for item_positions in positions)
+                          if instrumentation.is_enabled() else 0)
+    return positions
+
+
+def _find_items(graph, max_items):
     positions = [None] * max_items
     for i in range(len(positions)):
         positions[i] = []
 
+    if isinstance(graph, WarehouseGraph):
+        item_ids, records = graph.item_records()
+        for item, record in zip(item_ids.tolist(), records.tolist()):
+            positions[item].append(tuple(record))
+        return positions
+
     for idx, vertex in enumerate(graph.nodes):
         vertex = graph.nodes[vertex]
         if vertex['type'] == "Steiner node" or vertex['type'] == "Depot":
@@ -234,143 +248,172 @@ def find_items(graph, max_items):
     return positions
 
 
+# Generates items, assigns them into storage, and builds the array-backed graph according to wh_type specifications.
+def build_warehouse(wh_type, rng=None, policy="random"):
+    """ Generates full WarehouseGraph.
+
+    Generates items, assigns the items into storage locations and builds graph according to wh_type specifications.
+    The graph includes cross aisles and depot.
+
+    :param wh_type: The warehouse type.
+    :param rng: np.random.Generator used for the item assignment.
+    :param policy: "random" - generate_and_assign_items_random, or "abc" - generate_and_assign_items_abc.
+    :return: WarehouseGraph.
+    """
+    with instrumentation.stage("build_warehouse"):
+        if policy == "abc":
+            items = generate_and_assign_items_abc(wh_type, rng)
+        else:
+            items = generate_and_assign_items_random(wh_type, rng)
+        graph = WarehouseGraph.from_layout(AISLES[wh_type], ITEMS_IN_BLOCK[wh_type], CROSS_AISLES[wh_type], items)
+    instrumentation.count("nodes", len(graph))
+    instrumentation.count("edges", len(graph.edges))
+    return graph
+
+
 # Generates items, assigns them into storage, and generates full networkx graph according to wh_type specifications.
-def generate_warehouse_graph(wh_type):
+def generate_warehouse_graph(wh_type, rng=None):
     """ Generates full Networkx graph.
 
     Generates items, assigns the items into storage locations and generates graph according to wh_type specifications.
     The graph includes cross aisles and depot.
 
     :param wh_type: The warehouse type.
+    :param rng: np.random.Generator used for the item assignment.
     :return: Networkx graph.
     """
-    items = generate_and_assign_items_random(wh_type)
-    graph = nx.Graph()
-
-    depot_per_side = DEPOT_NODES[wh_type] // 2
-
-    graph.add_node("0")
-    graph.nodes["0"]['type'] = "Depot"
-
-    for cross_aisle in range(CROSS_AISLES[wh_type]):
-        for aisle in range(((AISLES[wh_type]-1)*3)+1):
-            # Add 2 highway node into graph
-            node_index_x = aisle
-            node_index_y = cross_aisle*ITEMS_IN_BLOCK[wh_type] + (2 * cross_aisle)
-            node_index_0 = "x" + str(node_index_x) + "y" + str(node_index_y)
-            graph.add_node(node_index_0)
-            graph.nodes[node_index_0]["type"] = "Steiner node"
-            graph.nodes[node_index_0]["x"] = node_index_x
-            graph.nodes[node_index_0]["y"] = node_index_y
-            graph.nodes[node_index_0]["left"] = None
-            graph.nodes[node_index_0]["right"] = None
-
-            node_index_y += 1
-            node_index_1 = "x" + str(node_index_x) + "y" + str(node_index_y)
-            graph.add_node(node_index_1)
-            graph.nodes[node_index_1]["type"] = "Steiner node"
-            graph.nodes[node_index_1]["x"] = node_index_x
-            graph.nodes[node_index_1]["y"] = node_index_y
-            graph.nodes[node_index_1]["left"] = None
-            graph.nodes[node_index_1]["right"] = None
-
-            # Add vertical edge
-            graph.add_edge(node_index_0, node_index_1, weight="120")
-
-            # Add edge connecting the vertex with the adjacent vertex to the left
-            if aisle != 0:
-                prev_index = "x" + str(aisle-1) + "y" + str(cross_aisle*ITEMS_IN_BLOCK[wh_type] + (2*cross_aisle))
-                graph.add_edge(prev_index, node_index_0, weight="240")
-                prev_index_1 = "x" + str(aisle - 1) + "y" + str(cross_aisle * ITEMS_IN_BLOCK[wh_type] + (2 * cross_aisle) + 1)
-                graph.add_edge(prev_index_1, node_index_1, weight="240")
-
-    # Add all item vertices
-    for aisle in range(AISLES[wh_type]):
-        x_pos = aisle*3
-        for position in range(ITEMS_IN_AISLE[wh_type]):
-            node_index = "x" + str(x_pos) + "y" + str(position + ((position // ITEMS_IN_BLOCK[wh_type])*2) + 2)
-            prev_index = "x" + str(x_pos) + "y" + str(position + ((position // ITEMS_IN_BLOCK[wh_type])*2) + 1)
-            graph.add_node(node_index)
-            graph.nodes[node_index]["type"] = "Shelf node"
-            graph.nodes[node_index]["x"] = x_pos
-            graph.nodes[node_index]["y"] = x_pos + ((position // ITEMS_IN_BLOCK[wh_type])*2) + 2
-            graph.nodes[node_index]["left"] = items[2 * aisle, position]
-            graph.nodes[node_index]["right"] = items[2 * aisle + 1, position]
-            graph.add_edge(node_index, prev_index, weight="120")
-            if (position + 1) % ITEMS_IN_BLOCK[wh_type] == 0:
-                next_index = "x" + str(x_pos) + "y" + str(position + (position // ITEMS_IN_BLOCK[wh_type]*2) + 3)
-                graph.add_edge(next_index, node_index, weight="120")
-    graph.add_edge("0", "x0y0", weight="0")
-
-    return graph
+    # The nodes and edges are counted by build_warehouse.
+    with instrumentation.stage("generate_warehouse_graph"):
+        return build_warehouse(wh_type, rng).to_networkx()
 
 
 # Generates random set of orders
-def generate_order(wh_graph):
-    item_positions = find_items(wh_graph, 50000)
-    items = []
-
-    max_item_idx = np.max(np.where(item_positions))
-    order_size = random.randint(6, 12)
-
-    used = set()
-    for i in range(order_size):
-        while True:
-            item_idx = random.randint(0, max_item_idx)
-            if item_idx not in used:
-                used.add(item_idx)
-                items.append(item_positions[item_idx])
-                break
+def generate_order(wh_graph, item_index=None, rng=None):
+    """ Generates a random order of 6 to 12 distinct stocked items.
 
-    return items
+    :param wh_graph: WarehouseGraph or networkx graph.
+    :param item_index: ItemIndex of the warehouse, built if None.
+    :param rng: np.random.Generator.
+    :return: List of locations of each ordered item, see find_items.
+    """
+    return generate_orders(wh_graph, 1, item_index, rng)[0]
+
+
+def generate_orders(wh_graph, orders, item_index=None, rng=None):
+    """ Generates random orders in a single batch.
+
+    :param wh_graph: WarehouseGraph or networkx graph.
+    :param orders: Number of orders.
+    :param item_index: ItemIndex of the warehouse, built if None.
+    :param rng: np.random.Generator.
+    :return: List of orders, see generate_order.
+    """
+    with instrumentation.stage("generate_orders"):
+        if item_index is None:
+            item_index = ItemIndex.from_warehouse(wh_graph)
+        offsets, items = item_index.sample_orders(orders, _generator(rng))
+        items = items.tolist()
+        result = [[item_index.positions(item) for item in items[offsets[i]:offsets[i+1]]] for i in range(orders)]
+    instrumentation.count("orders", orders)
+    instrumentation.count("order_items", len(items))
+    return result
+
+
+def generate_and_serialize_instance(wh_type, agents, orders_per_agent, file_path, rng=None):
+    """ Generates a warehouse with random orders for each agent and writes it into a file.
+
+    :param wh_type: The warehouse type.
+    :param agents: Number of agents.
+    :param orders_per_agent: Number of orders of each agent.
+    :param file_path: Path to the output file.
+    :param rng: np.random.Generator, derived from the random module state if None.
+    """
+    rng = _generator(rng)
+    graph = build_warehouse(wh_type, rng)
+    orders = generate_orders(graph, agents * orders_per_agent, rng=rng)
+    agents_orders = [orders[i*orders_per_agent:(i+1)*orders_per_agent] for i in range(agents)]
+    serialize_instance(graph, wh_type, agents_orders, file_path, compute_bounds(graph, agents_orders))
 
 
-def generate_and_serialize_instance(wh_type, agents, orders_per_agent, file_path):
-    graph = generate_warehouse_graph(wh_type)
-    vertices = [vertex for vertex in graph.nodes]
-    agents_orders = []
+def serialize_instance(graph, wh_type, agents_orders, file_path, bounds=None):
+    """ Writes the warehouse and the orders of the agents in the whole_instance.txt format.
 
-    for i in range(agents):
-        agents_orders.append([])
-        for j in range(orders_per_agent):
-            agents_orders[i].append(generate_order(graph))
+    The file is the layout section followed by the orders section, see write_layout and write_orders.
 
+    :param graph: WarehouseGraph.
+    :param wh_type: The warehouse type, written into the header line only.
+    :param agents_orders: List of orders of each agent, see generate_orders.
+    :param file_path: Path to the output file.
+    :param bounds: OrderBounds of the orders, see order_bounds.compute_bounds, written after the Target of each order.
+    """
     file = io.open(file_path, "w+")
+    write_layout(graph, wh_type, file)
+    write_orders(agents_orders, file, bounds)
+    file.close()
+
+
+def write_layout(graph, wh_type, file):
+    """ Writes the layout section: the vertices with their items and the edges.
+
+    :param graph: WarehouseGraph.
+    :param wh_type: The warehouse type, written into the header line only.
+    :param file: Text file open for writing.
+    """
+    vertices = graph.node_names()
+    shelf_items = graph.shelf_items()
+    shelf_index = np.full(len(vertices), -1)
+    shelf_index[graph.shelf_vertices] = np.arange(len(graph.shelf_vertices))
+
     file.write("Test warehouse instance of type " + str(wh_type) + "\n")
     file.write("Vertices: " + str(len(vertices)) + "\n")
-    file.write("Items per vertex: " + str(HEIGHT[wh_type]) + "\n")
+    file.write("Items per vertex: " + str(graph.items.shape[2]) + "\n")
 
     for i, vertex in enumerate(vertices):
-        file.write(str(i) + " " + vertex + " " + graph.nodes[vertex]["type"] + "\n")
-        if graph.nodes[vertex]["type"] == "Shelf node":
-            left = graph.nodes[vertex]["left"]
-            right = graph.nodes[vertex]["right"]
-            for j in range(HEIGHT[wh_type]):
-                file.write(str(left[j][0].astype(int)) + "," + str(left[j][1].astype(int)) + " ")
-            file.write("\n")
-            for j in range(HEIGHT[wh_type]):
-                file.write(str(right[j][0].astype(int)) + "," + str(right[j][1].astype(int)) + " ")
-            file.write("\n")
+        file.write(str(i) + " " + vertex + " " + TYPE_NAMES[graph.node_type[i]] + "\n")
+        if graph.node_type[i] == SHELF:
+            for side in shelf_items[shelf_index[i]].astype(int):
+                file.write("".join(str(item) + "," + str(pick_time) + " " for item, pick_time in side))
+                file.write("\n")
 
     file.write("Edges:\n")
 
-    for edge in graph.edges:
-        file.write(edge[0] + "," + edge[1] + " ")
+    for u, v in graph.edge_list():
+        file.write(vertices[u] + "," + vertices[v] + " ")
     file.write("\n")
 
-    file.write("Agents: " + str(agents) + "\n")
-    for i in range(agents):
-        file.write("Agent: " + str(i) + ", Orders: " + str(len(agents_orders[i])) + "\n")
-        for j in range(len(agents_orders[i])):
-            file.write("Order: " + str(j) + ", classes: " + str(len(agents_orders[i][j])) + " Source " + str(2*i) +
-                       " Target " + str(2*i) + "\n")
-            for item_class in agents_orders[i][j]:
+
+def write_orders(agents_orders, file, bounds=None):
+    """ Writes the orders section: the number of agents followed by the agents, see write_agents.
+
+    :param agents_orders: List of orders of each agent, see generate_orders.
+    :param file: Text file open for writing.
+    :param bounds: OrderBounds of the orders, not written if None.
+    """
+    file.write("Agents: " + str(len(agents_orders)) + "\n")
+    write_agents(agents_orders, file, bounds=bounds)
+
+
+def write_agents(agents_orders, file, first_agent=0, bounds=None):
+    """ Writes the orders of the agents, without the number of agents.
+
+    :param agents_orders: List of orders of each agent, see generate_orders.
+    :param file: Text file open for writing.
+    :param first_agent: Index of the first agent, agent i starts and ends at vertex 2*i.
+    :param bounds: OrderBounds of the orders, not written if None.
+    """
+    for i, orders in enumerate(agents_orders, first_agent):
+        file.write("Agent: " + str(i) + ", Orders: " + str(len(orders)) + "\n")
+        for j in range(len(orders)):
+            file.write("Order: " + str(j) + ", classes: " + str(len(orders[j])) + " Source " + str(2*i) +
+                       " Target " + str(2*i))
+            if bounds is not None:
+                file.write(" " + str(bounds[i - first_agent][j]))
+            file.write("\n")
+            for item_class in orders[j]:
                 for item in item_class:
                     file.write(str(item[0]) + "," + str(item[1]) + "," + str(item[2]) + " ")
                 file.write("\n")
 
-    file.close()
-    print()
-
 
-generate_and_serialize_instance(1, 10, 1, "../data/whole_instance.txt")
+if __name__ == "__main__":
+    generate_and_serialize_instance(1, 10, 1, "../data/whole_instance.txt", np.random.default_rng(123))
@@ -0,0 +1,199 @@
+"""Sparse model of the time-expanded graph used for the GLNS instances.
+
+Only the real edges are stored as COO arrays, every other pair of vertices has the default
+"infinity" weight. Memory therefore grows with the number of edges instead of final_size^2.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+import distance_matrix as dm
+
+
+@dataclass
+class TimeExpandedGraph:
+    """Time-expanded graph in COO form with a default weight for the missing edges."""
+
+    size: int
+    time_steps: int
+    layer_size: int
+    default_weight: int
+    rows: np.ndarray
+    cols: np.ndarray
+    weights: np.ndarray
+    # Unpruned indices of the vertices, None if the graph is not pruned.
+    vertices: np.ndarray = None
+
+    def index_of(self, vertices):
+        """ Maps unpruned vertex indices to the indices of the graph, -1 for pruned vertices.
+
+        :param vertices: Array of vertex indices of the unpruned graph.
+        :return: int64 array.
+        """
+        vertices = np.asarray(vertices, dtype=np.int64)
+        if self.vertices is None:
+            return vertices
+        idx = np.searchsorted(self.vertices, vertices).clip(max=len(self.vertices) - 1)
+        return np.where(self.vertices[idx] == vertices, idx, -1)
+
+    def to_csr(self):
+        """ Converts the edges into CSR arrays sorted by row and column.
+
+        If an edge is stored more than once, the last stored weight is kept.
+
+        :return: Tuple: (indptr, indices, weights).
+        """
+        order = np.lexsort((self.cols, self.rows))
+        rows, cols, weights = self.rows[order], self.cols[order], self.weights[order]
+        # Keep the last weight of duplicate edges, lexsort is stable.
+        last = np.ones(len(rows), dtype=bool)
+        last[:-1] = (rows[1:] != rows[:-1]) | (cols[1:] != cols[:-1])
+        rows, cols, weights = rows[last], cols[last], weights[last]
+        indptr = np.zeros(self.size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=self.size), out=indptr[1:])
+        return indptr, cols, weights
+
+    def iter_row_blocks(self, block_cells=1 << 20):
+        """ Yields the dense matrix in blocks of whole rows.
+
+        :param block_cells: Maximal number of cells in a block, at least one row is yielded.
+        :return: Generator of int64 arrays of shape (rows, size).
+        """
+        indptr, indices, weights = self.to_csr()
+        block_rows = max(1, block_cells // self.size)
+        for start in range(0, self.size, block_rows):
+            stop = min(start + block_rows, self.size)
+            block = np.full((stop - start, self.size), self.default_weight, dtype=np.int64)
+            local_rows = np.repeat(np.arange(stop - start), np.diff(indptr[start:stop+1]))
+            block[local_rows, indices[indptr[start]:indptr[stop]]] = weights[indptr[start]:indptr[stop]]
+            yield block
+
+    def iter_rows(self):
+        """ Yields the dense matrix row by row.
+
+        :return: Generator of int64 arrays of length size.
+        """
+        for block in self.iter_row_blocks(self.size):
+            yield block[0]
+
+    def to_dense(self):
+        """ Materializes the full (size, size) int64 matrix.
+
+        :return: Dense edge weight matrix.
+        """
+        matrix = np.full((self.size, self.size), self.default_weight, dtype=np.int64)
+        matrix[self.rows, self.cols] = self.weights
+        return matrix
+
+
+def _reachable(indptr, indices, sources):
+    """ Marks the vertices reachable from the sources by BFS over CSR arrays. """
+    seen = np.zeros(len(indptr) - 1, dtype=bool)
+    frontier = np.unique(np.asarray(sources, dtype=np.int64))
+    seen[frontier] = True
+    while frontier.size:
+        starts = indptr[frontier]
+        counts = indptr[frontier + 1] - starts
+        # Concatenated CSR ranges of the frontier vertices.
+        positions = np.arange(counts.sum()) + np.repeat(starts - np.cumsum(counts) + counts, counts)
+        frontier = np.unique(indices[positions])
+        frontier = frontier[~seen[frontier]]
+        seen[frontier] = True
+    return seen
+
+
+def prune_time_expanded_graph(expanded_graph):
+    """ Removes the layer vertices no tour over the real edges can use.
+
+    A tour starts at the depot vertex 0 and returns through a layer substitution vertex, so a
+    layer vertex is kept only if it is reachable from the depot (forward BFS) and a layer
+    substitution vertex is reachable from it (backward BFS). Both BFS run over the
+    time-expanded graph, so the travel and picking times are respected exactly. The depot
+    and the layer substitution vertices are always kept.
+
+    :param expanded_graph: TimeExpandedGraph, not pruned.
+    :return: Pruned TimeExpandedGraph, its vertices hold the kept unpruned indices.
+    """
+    time_steps = expanded_graph.time_steps
+    indptr, indices, _ = expanded_graph.to_csr()
+    forward = _reachable(indptr, indices, [0])
+    reverse = TimeExpandedGraph(expanded_graph.size, time_steps, expanded_graph.layer_size,
+                                expanded_graph.default_weight, expanded_graph.cols, expanded_graph.rows,
+                                expanded_graph.weights)
+    reverse_indptr, reverse_indices, _ = reverse.to_csr()
+    backward = _reachable(reverse_indptr, reverse_indices, np.arange(1, time_steps))
+
+    keep = forward & backward
+    keep[:time_steps] = True
+    vertices = np.flatnonzero(keep)
+    new_index = np.cumsum(keep) - 1
+    edges = keep[expanded_graph.rows] & keep[expanded_graph.cols]
+    return TimeExpandedGraph(len(vertices), time_steps, expanded_graph.layer_size, expanded_graph.default_weight,
+                             new_index[expanded_graph.rows[edges]].astype(expanded_graph.rows.dtype),
+                             new_index[expanded_graph.cols[edges]].astype(expanded_graph.cols.dtype),
+                             expanded_graph.weights[edges], vertices)
+
+
+def build_time_expanded_graph(graph, time_steps):
+    """ Builds the sparse time-expanded graph layer by layer.
+
+    Vertex idx of the base graph in layer t has index time_steps + t*layer_size + idx - 1,
+    the first time_steps indices are the layer substitution vertices.
+
+    :param graph: Warehouse graph including the special picking vertices.
+    :param time_steps: Number of time layers.
+    :return: TimeExpandedGraph.
+    """
+    vertices = [vertex for vertex in graph.nodes]
+    layer_size = len(vertices) - 1
+    final_size = (time_steps-1) * layer_size + time_steps
+    index_dtype = np.int32 if final_size < np.iinfo(np.int32).max else np.int64
+
+    vertex_types = np.array([graph.nodes[vertex]["type"] for vertex in vertices])
+    regular = np.isin(vertex_types, ("Steiner node", "Shelf node"))
+    special = np.flatnonzero(vertex_types == "Special")
+    special_regular = np.array([graph.nodes[vertices[idx]]["x"] for idx in special], dtype=np.int64)
+    indptr, indices = dm.csr_adjacency(graph)
+    edge_src = np.repeat(np.arange(len(vertices)), np.diff(indptr))
+    edge_dst = indices.astype(np.int64)
+    edge_mask = regular[edge_src] & (edge_dst != 0)
+    edge_src, edge_dst = edge_src[edge_mask], edge_dst[edge_mask]
+    depot_exit = vertices.index("x0y0") if "x0y0" in graph.nodes else None
+
+    rows, cols, weights = [], [], []
+
+    def add_edges(src, dst, weight):
+        rows.append(np.asarray(src, dtype=index_dtype))
+        cols.append(np.asarray(dst, dtype=index_dtype))
+        weights.append(np.full(len(rows[-1]), weight, dtype=np.int32))
+
+    # Index of vertex idx in layer t.
+    def layer_offset(time):
+        return time_steps + time * layer_size - 1
+
+    min_dist = 2
+    for time in range(1, min_dist):
+        add_edges([time], [time+1], 0)
+
+    # Set distances for layer substitution vertices
+    sub_rows, sub_cols = np.triu_indices(time_steps - min_dist)
+    add_edges(sub_rows + min_dist, sub_cols + min_dist, 0)
+
+    add_edges([0], [time_steps], 1)
+
+    for time in range(0, time_steps-1):
+        if depot_exit is not None:
+            # Set return path through substitution vertices.
+            add_edges([layer_offset(time) + depot_exit], [time+2], 1)
+        if time < time_steps - 2:
+            # Edges from layer time into time+1
+            add_edges(layer_offset(time) + edge_src, layer_offset(time+1) + edge_dst, 1)
+        if time > 0:
+            # Regular vertex in t-1 to the special pick vertex edge
+            add_edges(layer_offset(time-1) + special_regular, layer_offset(time) + special, 1)
+            if time < time_steps - 4:
+                # This pick vertex edge into regular again in t+3
+                add_edges(layer_offset(time) + special, layer_offset(time+3) + special_regular, 3)
+
+    return TimeExpandedGraph(final_size, time_steps, layer_size, time_steps * 1000,
+                             np.concatenate(rows), np.concatenate(cols), np.concatenate(weights))
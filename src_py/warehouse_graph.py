@@ -0,0 +1,207 @@
+"""Compact array-backed warehouse graph.
+
+Vertices are int32 indices in the same order as the nodes of the networkx graph built by
+test_warehouse_generator.generate_warehouse_graph: depot, cross aisle (Steiner) vertices
+and shelf vertices. Coordinates, types and the CSR adjacency are NumPy arrays.
+"""
+import networkx as nx
+import numpy as np
+
+DEPOT = 0
+STEINER = 1
+SHELF = 2
+TYPE_NAMES = ("Depot", "Steiner node", "Shelf node")
+
+CROSS_AISLE_EDGE = 240
+AISLE_EDGE = 120
+
+
+class WarehouseGraph:
+    """Warehouse graph with int32 vertex ids, NumPy attributes and CSR adjacency."""
+
+    def __init__(self, node_x, node_y, node_type, edges, edge_weights, items, shelf_vertices):
+        """ Creates the graph from its arrays, see from_layout.
+
+        :param node_x: x coordinate of each vertex, -1 for the depot.
+        :param node_y: y coordinate of each vertex, -1 for the depot.
+        :param node_type: DEPOT, STEINER or SHELF for each vertex.
+        :param edges: int32 array of shape (edges, 2) in insertion order.
+        :param edge_weights: int32 weight of each edge.
+        :param items: Item tensor of shape (columns, rows, height, 2), see
+                      test_warehouse_generator.generate_and_assign_items_random.
+        :param shelf_vertices: Shelf vertex of each (aisle, row), in aisle-major order.
+        """
+        self.node_x = node_x
+        self.node_y = node_y
+        self.node_type = node_type
+        self.edges = edges
+        self.edge_weights = edge_weights
+        self.items = items
+        self.shelf_vertices = shelf_vertices
+
+        # Every edge in both directions, neighbors keep the insertion order of the edges.
+        src = edges.ravel()
+        dst = edges[:, ::-1].ravel()
+        order = np.argsort(src, kind="stable")
+        self.indptr = np.zeros(len(node_type) + 1, dtype=np.int32)
+        np.cumsum(np.bincount(src, minlength=len(node_type)), out=self.indptr[1:])
+        self.indices = dst[order].astype(np.int32)
+        self.weights = np.repeat(edge_weights, 2)[order]
+
+    def __len__(self):
+        return len(self.node_type)
+
+    def arrays(self):
+        """ Returns the arrays defining the graph, WarehouseGraph(**graph.arrays()) recreates it.
+
+        :return: Dict of arrays.
+        """
+        return {"node_x": self.node_x, "node_y": self.node_y, "node_type": self.node_type, "edges": self.edges,
+                "edge_weights": self.edge_weights, "items": self.items, "shelf_vertices": self.shelf_vertices}
+
+    @classmethod
+    def from_layout(cls, aisles, items_in_block, cross_aisles, items):
+        """ Builds the aisle/cross aisle grid layout.
+
+        Every aisle is a column of shelf vertices split into blocks by the cross aisles,
+        each cross aisle consists of two rows of Steiner vertices.
+
+        :param aisles: Number of aisles.
+        :param items_in_block: Number of shelf vertices in one block of an aisle.
+        :param cross_aisles: Number of cross aisles.
+        :param items: Item tensor of shape (2*aisles, rows, height, 2).
+        :return: WarehouseGraph.
+        """
+        width = (aisles - 1) * 3 + 1
+        rows = items_in_block * (cross_aisles - 1)
+        block_height = items_in_block + 2
+
+        # Cross aisle vertices, ordered by cross aisle, x and the two rows.
+        cross, x, row = np.meshgrid(np.arange(cross_aisles), np.arange(width), np.arange(2), indexing="ij")
+        steiner_x = x.ravel()
+        steiner_y = (cross * block_height + row).ravel()
+
+        # Shelf vertices, ordered by aisle and position.
+        aisle, position = np.meshgrid(np.arange(aisles), np.arange(rows), indexing="ij")
+        shelf_x = (aisle * 3).ravel()
+        shelf_y = (position + (position // items_in_block) * 2 + 2).ravel()
+
+        node_x = np.concatenate(([-1], steiner_x, shelf_x)).astype(np.int32)
+        node_y = np.concatenate(([-1], steiner_y, shelf_y)).astype(np.int32)
+        node_type = np.concatenate(([DEPOT], np.full(len(steiner_x), STEINER), np.full(len(shelf_x), SHELF)))
+        node_type = node_type.astype(np.int8)
+
+        def steiner(cross_idx, x_idx, row_idx):
+            return 1 + (cross_idx * width + x_idx) * 2 + row_idx
+
+        def shelf(aisle_idx, position_idx):
+            return 1 + cross_aisles * width * 2 + aisle_idx * rows + position_idx
+
+        # Edges in the insertion order of the networkx generator.
+        edges, weights = [], []
+        for cross_idx in range(cross_aisles):
+            for x_idx in range(width):
+                edges.append((steiner(cross_idx, x_idx, 0), steiner(cross_idx, x_idx, 1)))
+                weights.append(AISLE_EDGE)
+                if x_idx != 0:
+                    edges.append((steiner(cross_idx, x_idx-1, 0), steiner(cross_idx, x_idx, 0)))
+                    edges.append((steiner(cross_idx, x_idx-1, 1), steiner(cross_idx, x_idx, 1)))
+                    weights += [CROSS_AISLE_EDGE, CROSS_AISLE_EDGE]
+        for aisle_idx in range(aisles):
+            for position_idx in range(rows):
+                block = position_idx // items_in_block
+                if position_idx % items_in_block == 0:
+                    prev_vertex = steiner(block, aisle_idx * 3, 1)
+                else:
+                    prev_vertex = shelf(aisle_idx, position_idx - 1)
+                edges.append((shelf(aisle_idx, position_idx), prev_vertex))
+                weights.append(AISLE_EDGE)
+                if (position_idx + 1) % items_in_block == 0:
+                    edges.append((steiner(block + 1, aisle_idx * 3, 0), shelf(aisle_idx, position_idx)))
+                    weights.append(AISLE_EDGE)
+        edges.append((0, steiner(0, 0, 0)))
+        weights.append(0)
+
+        shelf_vertices = shelf(np.arange(aisles)[:, None], np.arange(rows)[None, :]).ravel()
+        return cls(node_x, node_y, node_type, np.array(edges, dtype=np.int32),
+                   np.array(weights, dtype=np.int32), items, shelf_vertices.astype(np.int32))
+
+    def node_names(self):
+        """ Returns the networkx string ids of the vertices, "0" for depot and "x<x>y<y>" otherwise.
+
+        :return: List of strings.
+        """
+        return ["0" if node_type == DEPOT else "x" + str(x) + "y" + str(y)
+                for x, y, node_type in zip(self.node_x.tolist(), self.node_y.tolist(), self.node_type.tolist())]
+
+    def edge_list(self):
+        """ Lists the edges in the order of networkx Graph.edges of the converted graph.
+
+        :return: int32 array of shape (edges, 2).
+        """
+        src = np.repeat(np.arange(len(self), dtype=np.int32), np.diff(self.indptr))
+        mask = self.indices >= src
+        return np.stack((src[mask], self.indices[mask]), axis=1)
+
+    def neighbors(self, vertex):
+        return self.indices[self.indptr[vertex]:self.indptr[vertex+1]]
+
+    def shelf_items(self):
+        """ Item tensor view aligned with shelf_vertices.
+
+        :return: Array of shape (shelves, 2, height, 2) - shelf, side (left, right), height, (item, pick time).
+        """
+        columns, rows, height, _ = self.items.shape
+        return self.items.reshape(columns // 2, 2, rows, height, 2).transpose(0, 2, 1, 3, 4)\
+            .reshape(-1, 2, height, 2)
+
+    def item_records(self):
+        """ Lists every stored item with its location.
+
+        Records are ordered by vertex, height and side, the same order as the positions
+        returned by test_warehouse_generator.find_items.
+
+        :return: Tuple: (item ids, int32 records of shape (n, 3) - vertex, side, height).
+        """
+        shelf_items = self.shelf_items()
+        shelves, _, height, _ = shelf_items.shape
+        order = np.argsort(self.shelf_vertices, kind="stable")
+        # (shelf, height, side) order
+        item_ids = shelf_items[order, :, :, 0].transpose(0, 2, 1).reshape(-1).astype(np.int64)
+        vertex, level, side = np.meshgrid(self.shelf_vertices[order], np.arange(height), np.arange(2),
+                                          indexing="ij")
+        records = np.stack((vertex.ravel(), side.ravel(), level.ravel()), axis=1).astype(np.int32)
+        return item_ids, records
+
+    def to_networkx(self):
+        """ Converts the graph into the networkx representation with string node ids.
+
+        :return: Networkx graph.
+        """
+        graph = nx.Graph()
+        names = self.node_names()
+        shelf_aisle = np.full(len(self), -1)
+        shelf_row = np.full(len(self), -1)
+        rows = self.items.shape[1]
+        shelf_aisle[self.shelf_vertices] = np.arange(len(self.shelf_vertices)) // rows
+        shelf_row[self.shelf_vertices] = np.arange(len(self.shelf_vertices)) % rows
+
+        for vertex, name in enumerate(names):
+            graph.add_node(name)
+            attributes = graph.nodes[name]
+            attributes["type"] = TYPE_NAMES[self.node_type[vertex]]
+            if self.node_type[vertex] == DEPOT:
+                continue
+            attributes["x"] = int(self.node_x[vertex])
+            attributes["y"] = int(self.node_y[vertex])
+            if self.node_type[vertex] == SHELF:
+                aisle, row = shelf_aisle[vertex], shelf_row[vertex]
+                attributes["left"] = self.items[2 * aisle, row]
+                attributes["right"] = self.items[2 * aisle + 1, row]
+            else:
+                attributes["left"] = None
+                attributes["right"] = None
+
+        for (u, v), weight in zip(self.edges.tolist(), self.edge_weights.tolist()):
+            graph.add_edge(names[u], names[v], weight=str(weight))
+        return graph
@@ -0,0 +1,73 @@
+"""Snapshots of the parsed workbook tables.
+
+The columnar tables of a workbook are stored as a compressed NPZ file next to it,
+"<workbook>.snapshot.npz". A snapshot is valid while the workbook has the recorded
+modification time, or, if only the modification time changed, the recorded SHA-256 hash.
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+from data_tables import InventoryTable, ItemsTable, LocationsTable, OrdersTable
+
+# Increase whenever the parsed tables change for the same workbook.
+SNAPSHOT_VERSION = 1
+TABLES = (("locations", LocationsTable), ("items", ItemsTable), ("balance", InventoryTable),
+          ("orders", OrdersTable))
+
+
+def snapshot_path(data_path):
+    data_path = Path(data_path)
+    return data_path.with_name(data_path.name + ".snapshot.npz")
+
+
+def file_hash(path):
+    """ Computes the SHA-256 hex digest of a file. """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def save_snapshot(data_path, tables):
+    """ Stores the tables of the workbook into its snapshot.
+
+    :param data_path: Path to the workbook.
+    :param tables: Tuple: (LocationsTable, ItemsTable, InventoryTable, OrdersTable).
+    """
+    stat = os.stat(data_path)
+    meta = {"version": SNAPSHOT_VERSION, "mtime_ns": stat.st_mtime_ns, "size": stat.st_size,
+            "sha256": file_hash(data_path)}
+    arrays = {"meta": np.array(json.dumps(meta))}
+    for (name, _), table in zip(TABLES, tables):
+        arrays.update(table.to_arrays(name))
+
+    path = snapshot_path(data_path)
+    temp_path = path.with_name(path.name + "." + str(os.getpid()) + ".tmp")
+    with open(temp_path, "wb") as file:
+        np.savez_compressed(file, **arrays)
+    os.replace(temp_path, path)
+
+
+def load_snapshot(data_path):
+    """ Loads the tables of the workbook from its snapshot.
+
+    :param data_path: Path to the workbook.
+    :return: Tuple: (LocationsTable, ItemsTable, InventoryTable, OrdersTable), None if there is
+        no snapshot or it is out of date.
+    """
+    path = snapshot_path(data_path)
+    if not path.exists():
+        return None
+    with np.load(path) as arrays:
+        meta = json.loads(str(arrays["meta"]))
+        stat = os.stat(data_path)
+        if meta["version"] != SNAPSHOT_VERSION or meta["size"] != stat.st_size:
+            return None
+        if meta["mtime_ns"] != stat.st_mtime_ns and meta["sha256"] != file_hash(data_path):
+            return None
+        return tuple(table_type.from_arrays(arrays, name) for name, table_type in TABLES)
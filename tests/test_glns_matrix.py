@@ -0,0 +1,25 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.joinpath("src_py")))
+
+import glns_instance_generator as glns  # noqa: E402
+from warehouse_graph import WarehouseGraph  # noqa: E402
+
+
+def small_graph(products):
+    rng = np.random.default_rng(0)
+    items = np.zeros((4, 6, 2, 2))
+    items[..., 0] = rng.integers(1, 6, size=(4, 6, 2))
+    items[..., 1] = 1
+    graph = WarehouseGraph.from_layout(2, 3, 3, items).to_networkx()
+    glns.add_special_vertices(graph, products)
+    return graph
+
+
+@pytest.mark.parametrize("time_steps", [5, 8, 12])
+def test_vectorized_matrix_matches_loop(time_steps):
+    assert glns.verify_glns_matrix(small_graph([1, 3]), time_steps)